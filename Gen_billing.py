@@ -1,11 +1,29 @@
+import io
 import csv
 import os
 import re
 import sys
+import gzip
+import json
+import mmap
+import heapq
+import pickle
+import fnmatch
+import hashlib
+import zipfile
+import tempfile
+import time
 import argparse
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import Iterator, List, Dict, Tuple, Optional
+
+from billing_forecast import DEFAULT_LOOKBACK, DEFAULT_MODEL, FORECAST_MODELS, forecast_metrics
+from billing_store import BillingTotals, ProjectKey
+from run_metrics import RunMetrics, file_size, run_profiled
 
 
 # Configuración por defecto
@@ -13,9 +31,36 @@ DEFAULT_INPUT_FOLDER = "Files_report"
 BASE_PROJECT_PATH = "/Users/YeisonAndresParraVargas/Documents/github/console_gcp"
 OUTPUT_FOLDER = "Reports/Billing"
 
-# Umbrales para evitar porcentajes/proyecciones irreales por bases muy pequeñas
-MIN_PREV_SUBTOTAL_FOR_PCT = 10.0  # USD
-MIN_SUBTOTAL_FOR_FORECAST = 10.0  # USD
+# Procesos para parsear archivos en paralelo
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# Patrón de los exports de la consola (sueltos, .csv.gz o dentro de un .zip)
+BILLING_CSV_PATTERN = "*_Reports,*.csv"
+
+# Archivos .csv sin comprimir desde este tamaño se leen con mmap
+MMAP_THRESHOLD = 256 * 1024 * 1024  # bytes
+
+# Versión del formato de la caché de parciales: al cambiar el parser, las entradas viejas se descartan
+CACHE_VERSION = 2
+
+# Salida: filas por corrida ordenada en memoria (con más proyectos se vuelcan a disco y se mezclan),
+# filas por lectura de cada corrida durante la mezcla y líneas por escritura al archivo final
+SORT_RUN_ROWS = 50_000
+FORMAT_BATCH_ROWS = 5_000
+SPILL_BATCH_ROWS = 1_000
+OUTPUT_BATCH_ROWS = 5_000
+
+# Modo --watch: cada cuánto se revisa la carpeta y cuánto tiempo debe quedar sin cambios antes de procesar
+WATCH_INTERVAL = 5.0  # segundos
+WATCH_DEBOUNCE = 2.0  # segundos
+
+# Tiempos por etapa, tiempo de parseo por archivo y contadores; se guardan junto al consolidado
+metrics = RunMetrics("Gen_billing")
+
+
+def strip_compression_suffix(filename: str) -> str:
+    """'..._Reports, ... .csv.gz' -> '..._Reports, ... .csv' (el nombre lógico del export)"""
+    return filename[:-3] if filename.endswith(".csv.gz") else filename
 
 
 def parse_billing_filename(filename: str) -> Tuple[str, str, bool]:
@@ -31,6 +76,8 @@ def parse_billing_filename(filename: str) -> Tuple[str, str, bool]:
     - "Mi cuenta de facturación_Reports, 2026-01-01 — 2026-01-31 (1).csv"
       -> ("Mi cuenta de facturación", "2026-01", True)
     """
+    filename = strip_compression_suffix(filename)
+
     # Extraer mes (YYYY-MM)
     month_match = re.search(r"(\d{4})-(\d{2})-\d{2}", filename)
     if not month_match:
@@ -77,6 +124,51 @@ def generate_account_id(account_name: str, has_suffix: bool, suffix_num: int = N
     return display_name, account_id
 
 
+BillingSource = Tuple[str, str, Optional[str]]  # (nombre lógico del export, ruta, miembro del zip)
+
+
+@lru_cache(maxsize=256)
+def zip_billing_members(path: str, signature: Tuple[int, int]) -> Tuple[str, ...]:
+    """Miembros de billing del .zip; la firma es parte de la clave, así solo se relee si el .zip cambió"""
+    with zipfile.ZipFile(path) as zf:
+        return tuple(
+            info.filename for info in zf.infolist()
+            if not info.is_dir() and fnmatch.fnmatch(os.path.basename(info.filename), BILLING_CSV_PATTERN)
+        )
+
+
+def find_billing_sources(folder: Path) -> Tuple[List[BillingSource], List[BillingSource], List[str]]:
+    """
+    Exports de la carpeta como (nombre lógico, ruta, miembro), una sola fuente por nombre lógico.
+    Un mismo export puede estar suelto, en .csv.gz y dentro de un .zip (p. ej. el zip descargado y extraído
+    en la misma carpeta): se conserva el .csv plano, luego el .csv.gz y por último el miembro del .zip.
+    Retorna (fuentes, copias omitidas, zips ilegibles).
+    """
+    # Candidatos en orden de preferencia: el primero que aparece con cada nombre lógico es el que se usa
+    candidates = [(f.name, str(f), None) for f in folder.glob(BILLING_CSV_PATTERN)]
+    candidates += [(strip_compression_suffix(f.name), str(f), None) for f in folder.glob(f"{BILLING_CSV_PATTERN}.gz")]
+    bad_zips = []
+    for archive in folder.glob("*.zip"):
+        try:
+            members = zip_billing_members(str(archive), file_signature(str(archive)))
+        except FileNotFoundError:
+            # Borrado o renombrado entre el glob y el stat
+            continue
+        except zipfile.BadZipFile:
+            bad_zips.append(str(archive))
+            continue
+        candidates += [(os.path.basename(member), str(archive), member) for member in members]
+
+    sources, skipped, seen = [], [], set()
+    for candidate in candidates:
+        if candidate[0] in seen:
+            skipped.append(candidate)
+        else:
+            seen.add(candidate[0])
+            sources.append(candidate)
+    return sources, skipped, bad_zips
+
+
 def scan_billing_files(folder_path: str) -> List[Dict]:
     """
     Escanea la carpeta especificada y encuentra todos los archivos CSV de billing.
@@ -88,8 +180,14 @@ def scan_billing_files(folder_path: str) -> List[Dict]:
     if not folder.exists():
         raise ValueError(f"La carpeta no existe: {folder_path}")
     
-    # Buscar todos los archivos CSV que contengan "_Reports," en el nombre
-    csv_files = list(folder.glob("*_Reports,*.csv"))
+    # Buscar todos los archivos CSV que contengan "_Reports," en el nombre:
+    # sueltos, comprimidos con gzip o como miembros de un .zip -> (nombre lógico, ruta, miembro)
+    csv_files, skipped, bad_zips = find_billing_sources(folder)
+    for archive in bad_zips:
+        print(f"ADVERTENCIA: No se pudo abrir el zip: {os.path.basename(archive)}")
+    for csv_name, csv_path, member in skipped:
+        source = f"{os.path.basename(csv_path)}:{member}" if member else os.path.basename(csv_path)
+        print(f"ADVERTENCIA: Se omite la copia duplicada de {csv_name}: {source}")
     
     if not csv_files:
         print(f"ADVERTENCIA: No se encontraron archivos CSV de billing en: {folder_path}")
@@ -98,15 +196,15 @@ def scan_billing_files(folder_path: str) -> List[Dict]:
     # Agrupar archivos por cuenta de facturación para manejar duplicados
     account_groups = defaultdict(list)
     
-    for csv_file in csv_files:
-        account_name, month_key, has_suffix = parse_billing_filename(csv_file.name)
+    for csv_name, csv_path, member in csv_files:
+        account_name, month_key, has_suffix = parse_billing_filename(csv_name)
         
         if account_name is None:
-            print(f"ADVERTENCIA: No se pudo parsear el archivo: {csv_file.name}")
+            print(f"ADVERTENCIA: No se pudo parsear el archivo: {csv_name}")
             continue
         
         # Detectar sufijo numérico si existe
-        suffix_match = re.search(r"\((\d+)\)\.csv$", csv_file.name)
+        suffix_match = re.search(r"\((\d+)\)\.csv$", csv_name)
         suffix_num = int(suffix_match.group(1)) if suffix_match else None
         
         # Crear clave única para agrupar: nombre + sufijo
@@ -116,7 +214,8 @@ def scan_billing_files(folder_path: str) -> List[Dict]:
             group_key = (account_name, None)
         
         account_groups[group_key].append({
-            "path": str(csv_file),
+            "path": csv_path,
+            "member": member,
             "account_name": account_name,
             "month_key": month_key,
             "has_suffix": has_suffix,
@@ -135,6 +234,7 @@ def scan_billing_files(folder_path: str) -> List[Dict]:
         for file_info in files:
             input_files.append({
                 "path": file_info["path"],
+                "member": file_info["member"],
                 "account_name": display_name,
                 "account_id": account_id,
             })
@@ -170,62 +270,437 @@ def to_float(value: str) -> float:
         return float(value)
 
 
-def main(input_folder: str = None, output_folder: str = None, base_path: str = None) -> None:
-    # Usar argumentos si se proporcionan, sino usar valores por defecto
-    folder = input_folder if input_folder else DEFAULT_INPUT_FOLDER
-    base_project = base_path if base_path else BASE_PROJECT_PATH
-    out_folder = output_folder if output_folder else OUTPUT_FOLDER
-    
-    # Construir ruta completa de salida: base_project/Reports/Billing
-    full_output_path = os.path.join(base_project, out_folder)
-    
-    # Escanear archivos automáticamente
-    input_files = scan_billing_files(folder)
-    
-    if not input_files:
-        print("No se encontraron archivos de billing para procesar.")
-        return
-    
-    # totals[(account_name, account_id, project_name, project_id, project_number)][month_key] = subtotal
-    totals: dict = defaultdict(lambda: defaultdict(float))
-    months_found = set()
+def parse_subtotal(value: str) -> float:
+    """
+    Igual que to_float pero sin usar la excepción como camino normal:
+    la coma decimal se detecta antes de convertir.
+    """
+    if "," in value:
+        value = value.replace(",", ".")
+    value = value.strip()
+    return float(value) if value else 0.0
+
+
+def resolve_columns(header: List[str], names: List[str]) -> List[int]:
+    """
+    Índice de cada columna en el encabezado (None si no existe).
+    Si un nombre está repetido gana la última aparición, como en csv.DictReader.
+    """
+    positions = {name: idx for idx, name in enumerate(header)}
+    return [positions.get(name) for name in names]
+
+
+def iter_mmap_lines(path: str) -> Iterator[str]:
+    """Líneas de un CSV grande leídas desde un mmap de solo lectura, decodificadas una a una"""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+            # Lectura secuencial: el kernel puede liberar las páginas ya leídas
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+        first = True
+        for line in iter(mm.readline, b""):
+            text = line.decode("utf-8")
+            if first:
+                first = False
+                if text.startswith("\ufeff"):
+                    text = text[1:]
+            yield text
+
+
+@contextmanager
+def open_billing_csv(path: str, member: str = None) -> Iterator[Iterator[str]]:
+    """
+    Abre un export como flujo de texto sin descomprimirlo a disco:
+    miembro de un .zip, .csv.gz, .csv grande vía mmap o .csv normal.
+    """
+    if member is not None:
+        with zipfile.ZipFile(path) as zf, zf.open(member) as raw:
+            yield io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+    elif path.endswith(".gz"):
+        with gzip.open(path, "rt", encoding="utf-8-sig", newline="") as f:
+            yield f
+    elif os.path.getsize(path) >= MMAP_THRESHOLD:
+        yield iter_mmap_lines(path)
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            yield f
+
+
+def parse_billing_file(path: str, account_name: str, account_id: str, member: str = None) -> Dict[ProjectKey, float]:
+    """Subtotales parciales por proyecto de un CSV de billing (ver parse_billing_file_timed)"""
+    return parse_billing_file_timed(path, account_name, account_id, member)[0]
+
+
+def parse_billing_file_timed(
+    path: str, account_name: str, account_id: str, member: str = None
+) -> Tuple[Dict[ProjectKey, float], int, float]:
+    """
+    Parsea un CSV de billing y retorna sus subtotales parciales por proyecto:
+    {(account_name, account_id, project_name, project_id, project_number): subtotal}
+    Las claves conservan el orden de primera aparición en el archivo.
+
+    Los índices de columna se resuelven una sola vez desde el encabezado y las filas
+    se leen como listas (csv.reader); los textos de proyecto se internan al aparecer por primera vez.
+    Retorna (subtotales, líneas de datos leídas, segundos) para las métricas de la ejecución.
+    """
+    started = time.perf_counter()
+    by_project: Dict[Tuple[str, str, str], float] = {}
+    with open_billing_csv(path, member) as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return {}, 0, time.perf_counter() - started
+
+        name_idx, id_idx, number_idx, subtotal_idx, unrounded_idx = resolve_columns(header, [
+            "Project name",
+            "Project ID",
+            "Project number",
+            "Subtotal ($)",
+            "Unrounded subtotal ($)",
+        ])
+        if name_idx is None:
+            return {}, 0, time.perf_counter() - started
+
+        # Columnas ausentes en el encabezado apuntan (índice -1) a una celda vacía agregada a cada fila
+        optional = (id_idx, number_idx, subtotal_idx, unrounded_idx)
+        needed = max(idx for idx in (name_idx,) + optional if idx is not None) + 1
+        has_missing = None in optional
+        id_idx, number_idx, subtotal_idx, unrounded_idx = (-1 if idx is None else idx for idx in optional)
+        padding = [""] * needed
+
+        for row in reader:
+            if len(row) < needed:
+                # Filas cortas (o vacías): se completan para que todos los índices existan
+                row = row + padding[len(row):]
+            if has_missing:
+                row.append("")
+            project_name = row[name_idx].strip()
+
+            # Saltar filas de subtotal/impuestos (no tienen nombre de proyecto)
+            if not project_name:
+                continue
+
+            project = (project_name, row[id_idx].strip(), row[number_idx].strip())
+            subtotal = parse_subtotal(row[subtotal_idx] or row[unrounded_idx])
+
+            if project in by_project:
+                by_project[project] += subtotal
+            else:
+                project = tuple(sys.intern(value) for value in project)
+                by_project[project] = 0.0 + subtotal
+
+        rows_read = max(0, reader.line_num - 1)
+
+    partial = {(account_name, account_id) + project: subtotal for project, subtotal in by_project.items()}
+    return partial, rows_read, time.perf_counter() - started
+
+
+BillingFile = Tuple[str, str, str, Optional[str]]  # (path, account_name, account_id, miembro del zip)
+
+
+def parse_billing_files(files: List[BillingFile], workers: int = 1) -> List[Dict[ProjectKey, float]]:
+    """
+    Map: parsea cada (path, account_name, account_id, member) en un pool de procesos.
+    Los parciales se retornan en el mismo orden que `files`.
+    """
+    workers = min(workers, len(files))
+    if workers <= 1:
+        results = [parse_billing_file_timed(*file_args) for file_args in files]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(parse_billing_file_timed, *zip(*files)))
+
+    # Los procesos no comparten las métricas: cada parseo reporta sus filas y su tiempo al proceso principal
+    for _, rows_read, seconds in results:
+        metrics.record("parse_billing_file", seconds)
+        metrics.add("rows_read", rows_read)
+    metrics.add("files_parsed", len(files))
+    metrics.add("bytes_read", sum(file_size(path) for path in {file_args[0] for file_args in files}))
+    return [partial for partial, _, _ in results]
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_id(path: str, member: str = None) -> str:
+    """Identificador estable del export: ruta absoluta, más el miembro si viene dentro de un .zip"""
+    source = os.path.abspath(path)
+    return f"{source}::{member}" if member is not None else source
+
+
+def cache_entry_file(cache_dir: Path, path: str, member: str = None) -> Path:
+    """Cada archivo de billing tiene su entrada en la caché, nombrada por el hash de su ruta"""
+    return cache_dir / f"{hashlib.sha1(source_id(path, member).encode('utf-8')).hexdigest()}.json"
+
 
+def read_cache_entry(entry_file: Path) -> Optional[Dict]:
+    try:
+        with open(entry_file, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return entry if entry.get("version") == CACHE_VERSION else None
+
+
+def write_cache_entry(entry_file: Path, entry: Dict) -> None:
+    tmp_file = entry_file.with_suffix(".tmp")
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False)
+    os.replace(tmp_file, entry_file)
+
+
+def load_cached_partial(
+    cache_dir: Path, path: str, stat: os.stat_result, member: str = None
+) -> Optional[List[Tuple[Tuple[str, str, str], float]]]:
+    """
+    Retorna los subtotales cacheados [((project_name, project_id, project_number), subtotal)]
+    si el archivo no cambió, o None si hay que parsearlo.
+    Con el mismo tamaño y mtime se confía en la entrada; si solo cambió el mtime se compara el hash del contenido.
+    Para miembros de un .zip el tamaño, mtime y hash son los del .zip completo.
+    """
+    entry_file = cache_entry_file(cache_dir, path, member)
+    entry = read_cache_entry(entry_file)
+    if entry is None or entry["source"] != source_id(path, member) or entry["size"] != stat.st_size:
+        return None
+    if entry["mtime_ns"] != stat.st_mtime_ns:
+        if hash_file(path) != entry["sha256"]:
+            return None
+        entry["mtime_ns"] = stat.st_mtime_ns
+        write_cache_entry(entry_file, entry)
+    return [(tuple(row[:3]), row[3]) for row in entry["rows"]]
+
+
+def store_cached_partial(
+    cache_dir: Path, path: str, stat: os.stat_result, partial: Dict[ProjectKey, float], member: str = None
+) -> None:
+    # Las claves se guardan sin la cuenta: esta se deriva del nombre del archivo en cada ejecución
+    write_cache_entry(cache_entry_file(cache_dir, path, member), {
+        "version": CACHE_VERSION,
+        "source": source_id(path, member),
+        "path": os.path.abspath(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": hash_file(path),
+        "rows": [[*key[2:], subtotal] for key, subtotal in partial.items()],
+    })
+
+
+def evict_stale_cache_entries(cache_dir: Path) -> int:
+    """Elimina entradas de versiones anteriores o de archivos que ya no existen"""
+    evicted = 0
+    for entry_file in cache_dir.glob("*.json"):
+        entry = read_cache_entry(entry_file)
+        if entry is None or not os.path.exists(entry["path"]):
+            entry_file.unlink(missing_ok=True)
+            evicted += 1
+    return evicted
+
+
+def load_billing_partials(
+    files: List[BillingFile], workers: int = 1, cache_dir: str = None
+) -> List[Dict[ProjectKey, float]]:
+    """
+    Igual que parse_billing_files, pero con `cache_dir` reutiliza los parciales de archivos sin cambios
+    y solo parsea los nuevos o modificados.
+    """
+    if not cache_dir:
+        return parse_billing_files(files, workers)
+
+    cache = Path(cache_dir)
+    cache.mkdir(parents=True, exist_ok=True)
+    evicted = evict_stale_cache_entries(cache)
+
+    partials: List[Optional[Dict[ProjectKey, float]]] = [None] * len(files)
+    misses = []
+    stats = {}
+    for idx, (path, account_name, account_id, member) in enumerate(files):
+        stat = os.stat(path)
+        cached = load_cached_partial(cache, path, stat, member)
+        if cached is None:
+            misses.append(idx)
+            stats[idx] = stat
+        else:
+            partials[idx] = {(account_name, account_id) + project: subtotal for project, subtotal in cached}
+
+    parsed = parse_billing_files([files[idx] for idx in misses], workers)
+    for idx, partial in zip(misses, parsed):
+        partials[idx] = partial
+        path, _, _, member = files[idx]
+        store_cached_partial(cache, path, stats[idx], partial, member)
+
+    metrics.add("files_cached", len(files) - len(misses))
+    print(
+        f"Caché: {len(files) - len(misses)} archivos reutilizados, "
+        f"{len(misses)} parseados, {evicted} entradas obsoletas eliminadas"
+    )
+    return partials
+
+
+def collect_billing_files(input_files: List[Dict]) -> Tuple[List[BillingFile], List[str]]:
+    """Archivos a parsear (path, account_name, account_id, member) y el mes de cada uno, en el orden del escaneo"""
+    files_to_parse = []
+    file_months = []
     for entry in input_files:
         path = entry["path"]
-        account_name = entry["account_name"]
-        account_id = entry["account_id"]
 
         if not os.path.exists(path):
             print(f"ADVERTENCIA: no existe el archivo: {path}")
             continue
 
-        month_key = extract_month_key(path)
-        months_found.add(month_key)
+        member = entry.get("member")
+        files_to_parse.append((path, entry["account_name"], entry["account_id"], member))
+        file_months.append(extract_month_key(member or path))
+    return files_to_parse, file_months
 
-        with open(path, newline="", encoding="utf-8-sig") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                project_name = row.get("Project name", "").strip()
-                project_id = row.get("Project ID", "").strip()
-                project_number = row.get("Project number", "").strip()
 
-                # Saltar filas de subtotal/impuestos (no tienen nombre de proyecto)
-                if not project_name:
-                    continue
+def file_signature(path: str) -> Tuple[int, int]:
+    """(tamaño, mtime) del archivo; para miembros de un .zip es la del .zip completo"""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def folder_snapshot(folder: str) -> Dict[str, Tuple[str, Optional[str], Tuple[int, int]]]:
+    """
+    Fuente y firma de cada export de la carpeta (con la misma deduplicación que el escaneo), para detectar
+    cambios al vigilar: modificar una copia omitida no dispara una nueva agregación. El listado de cada .zip
+    se relee solo si cambió su firma; un .zip ilegible (p. ej. a medio copiar) entra con su propia firma.
+    """
+    sources, _, bad_zips = find_billing_sources(Path(folder))
+    snapshot = {}
+    for logical_name, path, member in sources:
+        try:
+            snapshot[logical_name] = (path, member, file_signature(path))
+        except FileNotFoundError:
+            # Borrado o renombrado entre el glob y el stat: se verá en la próxima revisión
+            continue
+    for archive in bad_zips:
+        try:
+            snapshot[archive] = (archive, None, file_signature(archive))
+        except FileNotFoundError:
+            continue
+    return snapshot
+
 
-                subtotal_str = row.get("Subtotal ($)", "") or row.get("Unrounded subtotal ($)", "")
-                subtotal = to_float(subtotal_str)
+SortedRecord = Tuple[str, str, int, str]  # (cuenta, nombre de proyecto, fila en el almacén, línea del CSV)
 
-                key = (account_name, account_id, project_name, project_id, project_number)
-                totals[key][month_key] += subtotal
 
-    if not totals:
-        print("No se encontraron datos de proyectos en los CSV indicados.")
+def sorted_run(
+    totals: BillingTotals, columns: List, start: int, end: int, forecast_model: str, forecast_lookback: int
+) -> List[SortedRecord]:
+    """
+    Filas [start, end) del almacén como líneas CSV ya formateadas, ordenadas por cuenta y nombre de proyecto.
+    Las métricas de tendencia y los montos se calculan de a FORMAT_BATCH_ROWS filas (cada fila depende
+    únicamente de sus meses), columna por columna, y cada fila queda como un único string.
+    """
+    # csv.writer sobre un buffer reutilizado: mismas comillas y separadores que la escritura directa
+    line_buffer = io.StringIO(newline="")
+    line_writer = csv.writer(line_buffer)
+    keys = totals.keys
+    run = []
+    for block_start in range(start, end, FORMAT_BATCH_ROWS):
+        block_end = min(end, block_start + FORMAT_BATCH_ROWS)
+        chunk = [column[block_start:block_end] for column in columns]
+        with metrics.stage("forecast"):
+            trends = forecast_metrics(chunk, forecast_model, forecast_lookback)
+        formatted = [[f"{v:.2f}" for v in column] for column in chunk]
+
+        for offset, idx in enumerate(range(block_start, block_end)):
+            key = keys[idx]
+            line_writer.writerow([*key, *(column[offset] for column in formatted), *trends[offset]])
+            run.append((key[0], key[2], idx, line_buffer.getvalue()))
+            line_buffer.seek(0)
+            line_buffer.truncate()
+    # El índice de fila desempata: mismo orden que una ordenación estable por orden de llegada
+    run.sort(key=lambda record: record[:3])
+    return run
+
+
+def spill_run(path: str, run: List[SortedRecord]) -> None:
+    with open(path, "wb") as f:
+        for batch_start in range(0, len(run), SPILL_BATCH_ROWS):
+            pickle.dump(run[batch_start:batch_start + SPILL_BATCH_ROWS], f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def read_run(path: str) -> Iterator[SortedRecord]:
+    """Relee una corrida volcada a disco de a SPILL_BATCH_ROWS filas"""
+    with open(path, "rb") as f:
+        while True:
+            try:
+                batch = pickle.load(f)
+            except EOFError:
+                return
+            yield from batch
+
+
+def sorted_billing_lines(
+    totals: BillingTotals,
+    columns: List,
+    forecast_model: str,
+    forecast_lookback: int,
+    run_rows: int = SORT_RUN_ROWS,
+) -> Iterator[str]:
+    """
+    Líneas del consolidado ordenadas por cuenta y nombre de proyecto (estable por orden de llegada).
+    Con más de `run_rows` proyectos se hace un ordenamiento externo: cada tramo se ordena y se vuelca a disco,
+    y las corridas se mezclan en flujo. En memoria nunca hay más de una corrida formateada, y durante la mezcla
+    solo SPILL_BATCH_ROWS filas por corrida.
+    """
+    total = len(totals)
+    run_rows = max(1, run_rows)
+    if total <= run_rows:
+        for record in sorted_run(totals, columns, 0, total, forecast_model, forecast_lookback):
+            yield record[3]
         return
 
-    # Orden cronológico de los meses detectados
-    months_sorted = sorted(months_found)
-    
+    with tempfile.TemporaryDirectory(prefix="gen_billing_runs_") as spill_dir:
+        runs = []
+        with metrics.stage("sort"):
+            for start in range(0, total, run_rows):
+                path = os.path.join(spill_dir, f"run_{len(runs):05d}.pickle")
+                spill_run(path, sorted_run(
+                    totals, columns, start, min(total, start + run_rows), forecast_model, forecast_lookback
+                ))
+                runs.append(path)
+        metrics.add("sort_runs", len(runs))
+        metrics.add("bytes_spilled", sum(file_size(path) for path in runs))
+        # Las claves (cuenta, proyecto, índice) son únicas: la mezcla nunca compara las filas
+        for record in heapq.merge(*(read_run(path) for path in runs)):
+            yield record[3]
+
+
+def write_lines_batched(out_f, lines: Iterator[str], batch_rows: int = OUTPUT_BATCH_ROWS) -> int:
+    """Escribe las líneas de a `batch_rows` con writelines; retorna cuántas se escribieron"""
+    written = 0
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= batch_rows:
+            out_f.writelines(batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        out_f.writelines(batch)
+        written += len(batch)
+    return written
+
+
+def write_consolidated(
+    totals: BillingTotals,
+    months_sorted: List[str],
+    full_output_path: str,
+    forecast_model: str,
+    forecast_lookback: int,
+    run_rows: int = SORT_RUN_ROWS,
+) -> str:
+    """
+    Escribe Billing_{último mes}.csv y retorna su ruta.
+    Se escribe a un archivo temporal y se reemplaza de una vez: quien lo lea nunca ve un consolidado a medias.
+    Las filas salen en flujo desde sorted_billing_lines: la memoria de la salida no crece con el consolidado.
+    """
     # Generar nombre del archivo basado en el último mes procesado
     if months_sorted:
         last_month = months_sorted[-1]  # Formato: YYYY-MM
@@ -239,6 +714,7 @@ def main(input_folder: str = None, output_folder: str = None, base_path: str = N
     
     # Ruta completa del archivo de salida
     output = str(output_dir / output_filename)
+    tmp_output = f"{output}.tmp"
 
     header_month_cols = [f"Subtotal {m}" for m in months_sorted]
 
@@ -248,7 +724,7 @@ def main(input_folder: str = None, output_folder: str = None, base_path: str = N
     projected_col_name = "Next Month Forecast"
     projected_growth_pct_col_name = "Next Month Growth %"
 
-    with open(output, "w", newline="", encoding="utf-8") as out_f:
+    with open(tmp_output, "w", newline="", encoding="utf-8", buffering=1024 * 1024) as out_f:
         writer = csv.writer(out_f)
         header = [
             "Billing Account Name",
@@ -263,106 +739,188 @@ def main(input_folder: str = None, output_folder: str = None, base_path: str = N
         ]
         writer.writerow(header)
 
-        for (account_name, account_id, project_name, project_id, project_number), monthly in sorted(
-            totals.items(), key=lambda x: (x[0][0], x[0][2])
-        ):
-            # Valores por mes en el orden de months_sorted
-            monthly_values = [monthly.get(m, 0.0) for m in months_sorted]
-
-            # Cambio porcentual entre el último y el penúltimo mes
-            percent_change_str = ""
-            if len(months_sorted) >= 2:
-                last = months_sorted[-1]
-                prev = months_sorted[-2]
-                last_val = monthly.get(last, 0.0)
-                prev_val = monthly.get(prev, 0.0)
-                # Calcular si hay un valor previo > 0 (evitar división por cero)
-                # Solo evitar si el valor previo es exactamente 0 o muy pequeño (< $0.01)
-                if prev_val > 0.01:
-                    pct_change = (last_val - prev_val) / prev_val * 100.0
-                    percent_change_str = f"{pct_change:.2f}%"
-                elif prev_val == 0.0 and last_val > 0:
-                    # Si pasó de 0 a un valor positivo, indicar crecimiento infinito o "N/A"
-                    percent_change_str = "N/A"
-
-            # Proyección del próximo mes (Feb) usando los últimos 3 meses (Nov, Dec, Jan)
-            projected_val_str = ""
-            projected_growth_pct_str = ""
-            if len(months_sorted) >= 2:
-                # Tomamos como máximo los últimos 3 meses
-                recent_months = months_sorted[-3:] if len(months_sorted) >= 3 else months_sorted
-                recent_vals = [monthly.get(m, 0.0) for m in recent_months]
-
-                # Preferimos una tasa mensual compuesta (CMGR) basada en el primer y último mes
-                # para evitar sesgos por picos en un solo mes.
-                # CMGR = (last/first)^(1/(n-1)) - 1  ;  Feb = last * (1 + CMGR)
-                n = len(recent_vals)
-                first_val = recent_vals[0] if n >= 1 else 0.0
-                last_val = recent_vals[-1] if n >= 1 else 0.0
-
-                if (
-                    n >= 3
-                    and first_val >= MIN_SUBTOTAL_FOR_FORECAST
-                    and last_val >= MIN_SUBTOTAL_FOR_FORECAST
-                ):
-                    cmgr = (last_val / first_val) ** (1.0 / (n - 1)) - 1.0
-                    projected_val = last_val * (1.0 + cmgr)
-                    projected_val_str = f"{projected_val:.2f}"
-                    projected_growth_pct_str = f"{cmgr * 100.0:.2f}%"
+        # Columnas por mes en el orden de months_sorted; las métricas se calculan por tramos del almacén
+        columns = totals.month_columns(months_sorted)
+        with metrics.stage("write"):
+            write_lines_batched(out_f, sorted_billing_lines(
+                totals, columns, forecast_model, forecast_lookback, run_rows
+            ))
+
+    os.replace(tmp_output, output)
+    return output
+
+
+class BillingConsolidator:
+    """
+    Conserva en memoria el parcial de cada export junto con su firma (tamaño, mtime).
+    Cada refresh() vuelve a escanear la carpeta, parsea solo los archivos nuevos o modificados y reescribe
+    el consolidado: la primera llamada equivale a una ejecución completa.
+    """
+
+    def __init__(
+        self,
+        folder: str,
+        full_output_path: str,
+        workers: int,
+        cache_dir: str = None,
+        forecast_model: str = DEFAULT_MODEL,
+        forecast_lookback: int = DEFAULT_LOOKBACK,
+        sort_run_rows: int = SORT_RUN_ROWS,
+    ) -> None:
+        self.folder = folder
+        self.full_output_path = full_output_path
+        self.workers = workers
+        self.cache_dir = cache_dir
+        self.forecast_model = forecast_model
+        self.forecast_lookback = forecast_lookback
+        self.sort_run_rows = sort_run_rows
+        # Subtotales por (account_name, account_id, project_name, project_id, project_number) y mes
+        self.totals = BillingTotals()
+        self.partials: Dict[BillingFile, Tuple[Tuple[int, int], str, Dict[ProjectKey, float]]] = {}
+
+    def refresh(self) -> Optional[str]:
+        """Retorna la ruta del consolidado, o None si no hubo nada que escribir"""
+        metrics.reset()
+        with metrics.stage("scan"):
+            input_files = scan_billing_files(self.folder)
+
+        if not input_files:
+            print("No se encontraron archivos de billing para procesar.")
+            return None
+
+        files_to_parse, file_months = collect_billing_files(input_files)
+        signatures = [file_signature(path) for path, _, _, _ in files_to_parse]
+        changed = [
+            idx for idx, billing_file in enumerate(files_to_parse)
+            if billing_file not in self.partials or self.partials[billing_file][0] != signatures[idx]
+        ]
+        current = set(files_to_parse)
+        removed = [billing_file for billing_file in self.partials if billing_file not in current]
+        replaced = bool(removed) or any(files_to_parse[idx] in self.partials for idx in changed)
+
+        # Map: parciales de los archivos nuevos o modificados en paralelo (con caché en disco si se configuró)
+        with metrics.stage("parse"):
+            parsed = load_billing_partials([files_to_parse[idx] for idx in changed], self.workers, self.cache_dir)
+        for idx, partial in zip(changed, parsed):
+            self.partials[files_to_parse[idx]] = (signatures[idx], file_months[idx], partial)
+        for billing_file in removed:
+            del self.partials[billing_file]
+
+        # Reduce: los archivos nuevos se suman sobre los totales existentes. Si un archivo se reemplazó o
+        # desapareció, los totales se rearman desde los parciales en memoria en el orden del escaneo
+        # (sin reparsear), así los montos quedan idénticos a los de una ejecución completa
+        with metrics.stage("aggregate"):
+            if replaced:
+                self.totals = BillingTotals()
+                to_add = range(len(files_to_parse))
+            else:
+                to_add = changed
+            for idx in to_add:
+                _, month_key, partial = self.partials[files_to_parse[idx]]
+                self.totals.add_partial(month_key, partial)
+
+        if not len(self.totals):
+            print("No se encontraron datos de proyectos en los CSV indicados.")
+            return None
+
+        # Orden cronológico de los meses detectados
+        months_sorted = sorted({month_key for _, month_key, _ in self.partials.values()})
+        output = write_consolidated(
+            self.totals, months_sorted, self.full_output_path, self.forecast_model, self.forecast_lookback,
+            self.sort_run_rows,
+        )
+
+        metrics.add("rows_written", len(self.totals))
+        metrics.add("bytes_written", file_size(output))
+        metrics.set_info(
+            report=os.path.abspath(output),
+            files=len(files_to_parse),
+            files_changed=len(changed),
+            files_removed=len(removed),
+            projects=len(self.totals),
+            months=len(months_sorted),
+            workers=self.workers,
+            forecast_model=self.forecast_model,
+        )
+        metrics.write(output)
+        return output
+
+
+def watch_billing_folder(
+    consolidator: BillingConsolidator, interval: float = WATCH_INTERVAL, debounce: float = WATCH_DEBOUNCE
+) -> None:
+    """
+    Revisa la carpeta cada `interval` segundos. Ante un cambio espera a que quede quieta durante `debounce`
+    segundos (copias en curso, varios exports seguidos) y actualiza el consolidado una sola vez.
+    """
+    print(f"Vigilando {consolidator.folder} cada {interval:g}s (Ctrl+C para terminar)")
+    last_snapshot = None
+    try:
+        while True:
+            snapshot = folder_snapshot(consolidator.folder)
+            if snapshot != last_snapshot:
+                while True:
+                    time.sleep(debounce)
+                    settled = folder_snapshot(consolidator.folder)
+                    if settled == snapshot:
+                        break
+                    snapshot = settled
+
+                started = time.perf_counter()
+                try:
+                    output = consolidator.refresh()
+                except Exception as e:
+                    # Export ilegible o a medio copiar: se reintenta en la próxima revisión
+                    print(f"ADVERTENCIA: no se pudo actualizar el consolidado, se reintentará: {e}")
                 else:
-                    # Fallback realista: tendencia lineal en USD usando los últimos 2 meses
-                    if n >= 2:
-                        prev_val = recent_vals[-2]
-                        
-                        # Si ambos meses son >= $10, usar tendencia lineal
-                        if prev_val >= MIN_SUBTOTAL_FOR_FORECAST and last_val >= MIN_SUBTOTAL_FOR_FORECAST:
-                            delta = last_val - prev_val
-                            projected_val = max(0.0, last_val + delta)
-                            projected_val_str = f"{projected_val:.2f}"
-                            if last_val > 0:
-                                projected_growth_pct_str = f"{(delta / last_val) * 100.0:.2f}%"
-                        # Si el último mes es >= $10 pero el anterior es pequeño, usar proyección conservadora
-                        elif last_val >= MIN_SUBTOTAL_FOR_FORECAST:
-                            if prev_val > 0:
-                                # Hay algún valor previo, proyectamos un crecimiento conservador del 5%
-                                projected_val = last_val * 1.05
-                                projected_val_str = f"{projected_val:.2f}"
-                                projected_growth_pct_str = "5.00%"
-                            else:
-                                # No hay valor previo significativo, mantenemos el valor actual
-                                projected_val = last_val
-                                projected_val_str = f"{projected_val:.2f}"
-                                projected_growth_pct_str = "0.00%"
-                        # Si ambos meses son pequeños pero hay tendencia (último mes > 0), calcular igual
-                        elif last_val > 0 and prev_val > 0:
-                            # Usar tendencia lineal incluso para valores pequeños
-                            delta = last_val - prev_val
-                            projected_val = max(0.0, last_val + delta)
-                            projected_val_str = f"{projected_val:.2f}"
-                            if last_val > 0:
-                                projected_growth_pct_str = f"{(delta / last_val) * 100.0:.2f}%"
-                        # Si solo el último mes tiene valor (prev_val = 0 o muy pequeño)
-                        elif last_val > 0:
-                            # Mantener el valor actual si no hay tendencia previa
-                            projected_val = last_val
-                            projected_val_str = f"{projected_val:.2f}"
-                            projected_growth_pct_str = "0.00%"
-
-            row = [
-                account_name,
-                account_id,
-                project_name,
-                project_id,
-                project_number,
-            ] + [f"{v:.2f}" for v in monthly_values] + [
-                percent_change_str,
-                projected_val_str,
-                projected_growth_pct_str,
-            ]
-
-            writer.writerow(row)
-
-    print(f"Archivo combinado generado: {os.path.abspath(output)}")
+                    last_snapshot = snapshot
+                    if output:
+                        print(
+                            f"Consolidado actualizado en {time.perf_counter() - started:.1f}s: "
+                            f"{os.path.abspath(output)}"
+                        )
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("Modo watch detenido.")
+
+
+def main(
+    input_folder: str = None,
+    output_folder: str = None,
+    base_path: str = None,
+    workers: int = None,
+    cache_dir: str = None,
+    forecast_model: str = DEFAULT_MODEL,
+    forecast_lookback: int = DEFAULT_LOOKBACK,
+    watch: bool = False,
+    watch_interval: float = WATCH_INTERVAL,
+    watch_debounce: float = WATCH_DEBOUNCE,
+    sort_run_rows: int = SORT_RUN_ROWS,
+) -> None:
+    # Usar argumentos si se proporcionan, sino usar valores por defecto
+    folder = input_folder if input_folder else DEFAULT_INPUT_FOLDER
+    base_project = base_path if base_path else BASE_PROJECT_PATH
+    out_folder = output_folder if output_folder else OUTPUT_FOLDER
+    
+    # Construir ruta completa de salida: base_project/Reports/Billing
+    full_output_path = os.path.join(base_project, out_folder)
+
+    consolidator = BillingConsolidator(
+        folder,
+        full_output_path,
+        workers if workers else DEFAULT_WORKERS,
+        cache_dir,
+        forecast_model,
+        forecast_lookback,
+        sort_run_rows,
+    )
+    if watch:
+        watch_billing_folder(consolidator, watch_interval, watch_debounce)
+        return
+
+    output = consolidator.refresh()
+    if output:
+        print(f"Archivo combinado generado: {os.path.abspath(output)}")
 
 
 if __name__ == "__main__":
@@ -388,9 +946,77 @@ if __name__ == "__main__":
         default=BASE_PROJECT_PATH,
         help=f"Ruta base del proyecto donde se guardará el archivo (default: {BASE_PROJECT_PATH})",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f"Procesos para parsear los archivos en paralelo; 1 = secuencial (default: {DEFAULT_WORKERS})",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=None,
+        help="Carpeta para cachear los subtotales de cada archivo entre ejecuciones (por defecto sin caché)",
+    )
+    parser.add_argument(
+        "--forecast-model",
+        type=str,
+        choices=list(FORECAST_MODELS),
+        default=DEFAULT_MODEL,
+        help=f"Modelo para Next Month Forecast / Growth % (default: {DEFAULT_MODEL})",
+    )
+    parser.add_argument(
+        "--lookback",
+        type=int,
+        default=DEFAULT_LOOKBACK,
+        help=f"Meses recientes que usa el modelo de proyección (default: {DEFAULT_LOOKBACK})",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        default=None,
+        help="Ejecuta bajo cProfile y guarda las estadísticas en este archivo (.prof); solo el proceso principal",
+    )
+    parser.add_argument(
+        "--sort-run-rows",
+        type=int,
+        default=SORT_RUN_ROWS,
+        help=f"Proyectos ordenados en memoria por corrida al escribir; con más se ordena en disco (default: {SORT_RUN_ROWS})",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Sigue corriendo y actualiza el consolidado cada vez que llegan o cambian exports en la carpeta",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=WATCH_INTERVAL,
+        help=f"Segundos entre revisiones de la carpeta en modo --watch (default: {WATCH_INTERVAL:g})",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=WATCH_DEBOUNCE,
+        help=f"Segundos sin cambios en la carpeta antes de procesar una ráfaga de archivos (default: {WATCH_DEBOUNCE:g})",
+    )
     
     args = parser.parse_args()
     
     # Llamar a main con los argumentos
-    main(input_folder=args.folder, output_folder=args.output_folder, base_path=args.base_path)
+    run_profiled(
+        args.profile,
+        main,
+        input_folder=args.folder,
+        output_folder=args.output_folder,
+        base_path=args.base_path,
+        workers=args.workers,
+        cache_dir=args.cache_dir,
+        forecast_model=args.forecast_model,
+        forecast_lookback=args.lookback,
+        watch=args.watch,
+        watch_interval=args.interval,
+        watch_debounce=args.debounce,
+        sort_run_rows=args.sort_run_rows,
+    )
 
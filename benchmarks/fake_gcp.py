@@ -0,0 +1,227 @@
+"""
+Clientes falsos, en proceso, que reemplazan a los de asset_v1, billing_v1, resourcemanager_v3 y bigquery.
+
+Cada llamada (y cada página de search_all_resources) duerme `latency` segundos para simular la red,
+y se cuentan las llamadas por método. No requieren credenciales ni red.
+"""
+import threading
+import time
+import types
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from synthetic_data import ASSET_TYPES
+
+
+class FakeBackend:
+    """Estado compartido por los clientes falsos: latencia, tamaño de página, datos y contadores"""
+
+    def __init__(self, resources_per_project: int = 200, page_size: int = 500, latency: float = 0.0,
+                 billing_accounts: int = 5, months=("202601", "202512", "202511")):
+        self.resources_per_project = resources_per_project
+        self.page_size = page_size
+        self.latency = latency
+        self.billing_accounts = billing_accounts
+        self.months = list(months)
+        self.calls = Counter()
+        self.lock = threading.Lock()
+
+    def call(self, method: str) -> None:
+        with self.lock:
+            self.calls[method] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    @staticmethod
+    def project_index(project_id: str) -> int:
+        digits = "".join(ch for ch in project_id if ch.isdigit())
+        return int(digits) if digits else 0
+
+    def project_number(self, project_id: str) -> str:
+        return f"projects/{500000000 + self.project_index(project_id)}"
+
+
+class FakeResource(types.SimpleNamespace):
+    pass
+
+
+class FakePage:
+    def __init__(self, results):
+        self.results = results
+
+
+class FakeSearchPager:
+    """Imita el pager de search_all_resources: se itera por recurso o por `.pages`"""
+
+    def __init__(self, backend: FakeBackend, project_ids: List[str], asset_types: List[str], page_size: int):
+        self.backend = backend
+        self.project_ids = project_ids
+        # Sin filtro se devuelven todos los tipos; con filtro, el subconjunto de esos mismos recursos
+        self.asset_types = set(asset_types or ASSET_TYPES)
+        self.page_size = min(page_size or backend.page_size, backend.page_size)
+
+    def resources(self):
+        created = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        for project_id in self.project_ids:
+            number = self.backend.project_number(project_id)
+            for idx in range(self.backend.resources_per_project):
+                asset_type = ASSET_TYPES[idx % len(ASSET_TYPES)]
+                if asset_type not in self.asset_types:
+                    continue
+                yield FakeResource(
+                    name=f"//{asset_type.split('/')[0]}/projects/{project_id}/resources/r{idx:06d}",
+                    display_name=f"r{idx:06d}",
+                    asset_type=asset_type,
+                    project=number,
+                    location="us-central1",
+                    labels={"env": "bench", "team": f"t{idx % 7}"},
+                    state="ACTIVE",
+                    create_time=created,
+                    update_time=created + timedelta(hours=idx),
+                    parent_full_resource_name=f"//cloudresourcemanager.googleapis.com/projects/{project_id}",
+                )
+
+    @property
+    def pages(self):
+        batch = []
+        for resource in self.resources():
+            batch.append(resource)
+            if len(batch) == self.page_size:
+                self.backend.call("search_all_resources.page")
+                yield FakePage(batch)
+                batch = []
+        if batch:
+            self.backend.call("search_all_resources.page")
+            yield FakePage(batch)
+
+    def __iter__(self):
+        for page in self.pages:
+            yield from page.results
+
+
+class FakeAssetServiceClient:
+    def __init__(self, backend: FakeBackend, organization_projects: List[str] = ()):
+        self.backend = backend
+        self.organization_projects = list(organization_projects)
+
+    def search_all_resources(self, request=None, timeout=None, **kwargs):
+        request = request or {}
+        self.backend.call("search_all_resources")
+        scope = request.get("scope", "")
+        if scope.startswith("projects/"):
+            project_ids = [scope.split("/", 1)[1]]
+        else:
+            project_ids = self.organization_projects
+        return FakeSearchPager(self.backend, project_ids, request.get("asset_types"), request.get("page_size"))
+
+
+class FakeCloudBillingClient:
+    def __init__(self, backend: FakeBackend):
+        self.backend = backend
+
+    def get_project_billing_info(self, name: str, timeout=None, **kwargs):
+        self.backend.call("get_project_billing_info")
+        idx = self.backend.project_index(name)
+        return types.SimpleNamespace(
+            billing_enabled=idx % 10 != 9,
+            billing_account_name=f"billingAccounts/{idx % self.backend.billing_accounts:06X}-BENCH0-000000",
+        )
+
+    def get_billing_account(self, name: str, timeout=None, **kwargs):
+        self.backend.call("get_billing_account")
+        return types.SimpleNamespace(display_name=f"Bench account {name.split('/')[-1]}")
+
+
+class FakeProjectsClient:
+    def __init__(self, backend: FakeBackend):
+        self.backend = backend
+
+    def get_project(self, name: str, timeout=None, **kwargs):
+        self.backend.call("get_project")
+        project_id = name.split("/", 1)[1]
+        return types.SimpleNamespace(
+            name=self.backend.project_number(project_id),
+            project_id=project_id,
+            create_time=datetime(2023, 1, 1, tzinfo=timezone.utc) + timedelta(days=self.backend.project_index(project_id)),
+        )
+
+
+class FakeQueryJob:
+    def __init__(self, rows, total_bytes_processed=None):
+        self.rows = rows
+        self.total_bytes_processed = 1024 * len(rows) if total_bytes_processed is None else total_bytes_processed
+        self.total_bytes_billed = self.total_bytes_processed
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def result(self, *args, **kwargs):
+        return self
+
+
+class FakeBigQueryClient:
+    def __init__(self, backend: FakeBackend):
+        self.backend = backend
+
+    def query(self, query: str, job_config=None, **kwargs):
+        if getattr(job_config, "dry_run", False):
+            self.backend.call("bigquery.dry_run")
+            return FakeQueryJob([], total_bytes_processed=4096)
+        self.backend.call("bigquery.query")
+        params: Dict[str, list] = {
+            param.name: param.values for param in getattr(job_config, "query_parameters", [])
+        }
+        rows = [
+            types.SimpleNamespace(project_id=project_id, month=month, total_cost=round(self.backend.project_index(project_id) * 1.5, 2))
+            for project_id in params.get("project_ids", [])
+            for month in params.get("months", self.backend.months)
+        ]
+        return FakeQueryJob(rows)
+
+
+class FakeQueryJobConfig:
+    def __init__(self, query_parameters=(), **kwargs):
+        self.query_parameters = list(query_parameters)
+        self.__dict__.update(kwargs)
+
+
+class FakeArrayQueryParameter:
+    def __init__(self, name, type_, values):
+        self.name, self.type_, self.values = name, type_, list(values)
+
+
+class FakeScalarQueryParameter:
+    def __init__(self, name, type_, value):
+        self.name, self.type_, self.values = name, type_, value
+
+
+def fake_bigquery_module(backend: FakeBackend) -> types.ModuleType:
+    module = types.ModuleType("fake_bigquery")
+    module.Client = lambda *args, **kwargs: FakeBigQueryClient(backend)
+    module.QueryJobConfig = FakeQueryJobConfig
+    module.ArrayQueryParameter = FakeArrayQueryParameter
+    module.ScalarQueryParameter = FakeScalarQueryParameter
+    return module
+
+
+def install_fake_clients(backend: FakeBackend, organization_projects: List[str] = ()) -> None:
+    """Reemplaza los clientes de Google en inventory y billing_report por los falsos"""
+    import billing_report
+    import inventory
+
+    asset_client = FakeAssetServiceClient(backend, organization_projects)
+    inventory.asset_client = lambda: asset_client
+    inventory.projects_client = lambda: FakeProjectsClient(backend)
+
+    # Los scripts importan las librerías de Google en el primer uso: nunca llegan a cargarse
+    fake_modules = {"bigquery": fake_bigquery_module(backend)}
+    billing_report.google_cloud = lambda name: fake_modules[name]
+    billing_report.CLIENT_FACTORIES.update({
+        "billing": lambda: FakeCloudBillingClient(backend),
+        "projects": lambda: FakeProjectsClient(backend),
+        "assets": lambda: asset_client,
+        "bigquery": lambda: FakeBigQueryClient(backend),
+    })
+    billing_report._clients.clear()
+    billing_report.billing_accounts = billing_report.BillingAccountCache()
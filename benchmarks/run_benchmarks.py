@@ -0,0 +1,178 @@
+"""
+Benchmarks offline de los tres scripts con datos sintéticos y clientes falsos.
+
+Uso:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --only gen_billing --projects 2000 --months 24 --workers 4
+    python benchmarks/run_benchmarks.py --latency 0.05 --json bench.json
+
+Cada benchmark reporta tiempo total, filas/seg y pico de memoria Python (tracemalloc, solo el proceso
+principal; medido en una ejecución aparte) y se ejecuta en una carpeta temporal: no necesita credenciales, red ni datos reales.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_gcp import FakeBackend, install_fake_clients  # noqa: E402
+from synthetic_data import generate_billing_exports, write_assets_file, write_projects_file  # noqa: E402
+
+
+@contextlib.contextmanager
+def working_dir(path: str):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def measure(name: str, run: Callable[[], int], repeat: int = 1, verbose: bool = False) -> Dict:
+    """
+    Ejecuta `run` (que retorna las filas procesadas) `repeat` veces y reporta el mejor tiempo.
+    El pico de memoria se mide en una ejecución adicional bajo tracemalloc, que no se cronometra
+    porque tracemalloc hace mucho más lentas las asignaciones.
+    """
+    def silent_run() -> int:
+        with contextlib.redirect_stdout(sys.stdout if verbose else io.StringIO()):
+            return run()
+
+    best = None
+    rows = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = silent_run()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    try:
+        silent_run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "benchmark": name,
+        "seconds": round(best, 4),
+        "rows": rows,
+        "rows_per_sec": round(rows / best, 1) if best else None,
+        "peak_mem_mb": round(peak / (1024 * 1024), 2),
+    }
+
+
+def bench_gen_billing(args, workdir: str) -> Dict:
+    import Gen_billing
+
+    folder = os.path.join(workdir, "Files_report")
+    _, total_rows = generate_billing_exports(
+        folder,
+        accounts=args.accounts,
+        projects=args.projects,
+        months=args.months,
+        rows_per_project=args.rows,
+        seed=args.seed,
+    )
+
+    def run() -> int:
+        Gen_billing.main(input_folder=folder, output_folder="Reports/Billing", base_path=workdir, workers=args.workers)
+        return total_rows
+
+    return measure("gen_billing.main", run, args.repeat, args.verbose)
+
+
+def bench_inventory(args, workdir: str, backend: FakeBackend) -> Dict:
+    import inventory
+
+    def run() -> int:
+        with working_dir(workdir):
+            inventory.export_inventory_to_csv(workers=args.workers)
+        return args.projects * backend.resources_per_project
+
+    return measure("inventory.export_inventory_to_csv", run, args.repeat, args.verbose)
+
+
+def bench_billing_report(args, workdir: str, backend: FakeBackend) -> Dict:
+    import billing_report
+
+    def run() -> int:
+        # Cada repetición arranca en frío: clientes y caché de cuentas nuevos
+        install_fake_clients(backend)
+        with working_dir(workdir):
+            billing_report.generate_billing_report(
+                max_workers=args.workers,
+                rate_limits={api: args.qps for api in billing_report.API_RATE_LIMITS},
+            )
+        return args.projects
+
+    return measure("billing_report.generate_billing_report", run, args.repeat, args.verbose)
+
+
+BENCHMARKS = ["gen_billing", "inventory", "billing_report"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks offline de Gen_billing, inventory y billing_report")
+    parser.add_argument("--only", choices=BENCHMARKS, action="append", help="Benchmark a ejecutar (repetible)")
+    parser.add_argument("--accounts", type=int, default=3, help="Cuentas de facturación sintéticas (default: 3)")
+    parser.add_argument("--projects", type=int, default=200, help="Proyectos por cuenta / en projects.txt (default: 200)")
+    parser.add_argument("--months", type=int, default=12, help="Meses de exports de billing (default: 12)")
+    parser.add_argument("--rows", type=int, default=20, help="Filas por proyecto y mes en cada export (default: 20)")
+    parser.add_argument("--resources", type=int, default=200, help="Recursos por proyecto en el inventario falso (default: 200)")
+    parser.add_argument("--page-size", type=int, default=500, help="Tamaño máximo de página de search_all_resources (default: 500)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latencia simulada por llamada/página en segundos (default: 0)")
+    parser.add_argument("--workers", type=int, default=4, help="Workers/procesos para los scripts (default: 4)")
+    parser.add_argument("--qps", type=float, default=0, help="Límite por API en billing_report, 0 = sin límite (default: 0)")
+    parser.add_argument("--repeat", type=int, default=1, help="Repeticiones; se reporta el mejor tiempo (default: 1)")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla de los datos sintéticos (default: 0)")
+    parser.add_argument("--json", type=str, default=None, help="Archivo donde guardar los resultados en JSON")
+    parser.add_argument("--verbose", action="store_true", help="Muestra la salida de los scripts")
+    args = parser.parse_args()
+
+    selected = args.only or BENCHMARKS
+    backend = FakeBackend(
+        resources_per_project=args.resources,
+        page_size=args.page_size,
+        latency=args.latency,
+    )
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="console_gcp_bench_") as workdir:
+        if "inventory" in selected or "billing_report" in selected:
+            write_projects_file(os.path.join(workdir, "projects.txt"), args.projects)
+            write_assets_file(os.path.join(workdir, "assets.txt"))
+            install_fake_clients(backend)
+
+        if "gen_billing" in selected:
+            results.append(bench_gen_billing(args, workdir))
+        if "inventory" in selected:
+            results.append(bench_inventory(args, workdir, backend))
+        if "billing_report" in selected:
+            results.append(bench_billing_report(args, workdir, backend))
+
+    print(f"{'benchmark':<42} {'seconds':>9} {'rows':>10} {'rows/sec':>12} {'peak MB':>9}")
+    for result in results:
+        print(
+            f"{result['benchmark']:<42} {result['seconds']:>9.3f} {result['rows']:>10} "
+            f"{result['rows_per_sec']:>12,.0f} {result['peak_mem_mb']:>9.2f}"
+        )
+    print(f"Llamadas a clientes falsos: {dict(backend.calls)}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"params": vars(args), "results": results, "calls": dict(backend.calls)}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Generadores de datos sintéticos para los benchmarks: exports de billing de la consola
+(*_Reports,*.csv) y los archivos projects.txt / assets.txt que leen inventory.py y billing_report.py.
+"""
+import calendar
+import csv
+import os
+import random
+from typing import List, Tuple
+
+BILLING_HEADER = [
+    "Billing account name",
+    "Billing account ID",
+    "Project name",
+    "Project ID",
+    "Project number",
+    "Service description",
+    "Service ID",
+    "SKU description",
+    "SKU ID",
+    "Cost type",
+    "Usage amount",
+    "Usage unit",
+    "Unrounded subtotal ($)",
+    "Subtotal ($)",
+]
+
+SERVICES = [
+    ("Compute Engine", "6F81-5844-456A"),
+    ("Cloud Storage", "95FF-2EF5-5EA1"),
+    ("BigQuery", "24E6-581D-38E5"),
+    ("Cloud Run", "152E-C115-5142"),
+    ("Cloud SQL", "9662-B51E-5089"),
+    ("Networking", "E505-1604-58F8"),
+]
+
+ASSET_TYPES = [
+    "compute.googleapis.com/Instance",
+    "compute.googleapis.com/Disk",
+    "storage.googleapis.com/Bucket",
+    "run.googleapis.com/Service",
+    "sqladmin.googleapis.com/Instance",
+    "container.googleapis.com/Cluster",
+]
+
+
+def month_keys(months: int, last_month: str = "2026-01") -> List[str]:
+    """Los `months` meses (YYYY-MM) que terminan en `last_month`, en orden cronológico"""
+    year, month = (int(part) for part in last_month.split("-"))
+    keys = []
+    for _ in range(months):
+        keys.append(f"{year:04d}-{month:02d}")
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+    return keys[::-1]
+
+
+def billing_export_filename(account_name: str, month_key: str) -> str:
+    year, month = (int(part) for part in month_key.split("-"))
+    last_day = calendar.monthrange(year, month)[1]
+    return f"{account_name}_Reports, {month_key}-01 — {month_key}-{last_day:02d}.csv"
+
+
+def generate_billing_exports(
+    folder: str,
+    accounts: int = 3,
+    projects: int = 200,
+    months: int = 12,
+    rows_per_project: int = 20,
+    seed: int = 0,
+) -> Tuple[List[str], int]:
+    """
+    Escribe un export por cuenta y mes con `projects` proyectos por cuenta y `rows_per_project`
+    filas (servicio/SKU) por proyecto, más la fila de impuestos sin proyecto que trae la consola.
+    Retorna (archivos generados, filas de datos escritas).
+    """
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    files = []
+    total_rows = 0
+
+    for account in range(accounts):
+        account_name = f"Billing Account {account:02d}"
+        account_id = f"{account:06X}-ABCDEF-123456"
+        # Costo base por proyecto y tendencia mensual, para que las proyecciones tengan algo que medir
+        bases = [rng.uniform(0.0, 2000.0) for _ in range(projects)]
+        trends = [rng.uniform(-0.1, 0.2) for _ in range(projects)]
+
+        for month_idx, month_key in enumerate(month_keys(months)):
+            path = os.path.join(folder, billing_export_filename(account_name, month_key))
+            with open(path, "w", newline="", encoding="utf-8-sig") as f:
+                writer = csv.writer(f)
+                writer.writerow(BILLING_HEADER)
+                for project in range(projects):
+                    project_id = f"bench-{account:02d}-{project:05d}"
+                    monthly = bases[project] * (1.0 + trends[project]) ** month_idx
+                    for row in range(rows_per_project):
+                        service, service_id = SERVICES[row % len(SERVICES)]
+                        amount = monthly / rows_per_project * rng.uniform(0.5, 1.5)
+                        writer.writerow([
+                            account_name,
+                            account_id,
+                            f"Bench project {account:02d}-{project:05d}",
+                            project_id,
+                            str(100000000 + account * 100000 + project),
+                            service,
+                            service_id,
+                            f"{service} SKU {row}",
+                            f"SKU-{row:04d}",
+                            "Usage",
+                            f"{rng.uniform(0, 1000):.3f}",
+                            "hour",
+                            f"{amount:.6f}",
+                            f"{amount:.2f}",
+                        ])
+                    total_rows += rows_per_project
+                writer.writerow([account_name, account_id, "", "", "", "", "", "", "", "Tax", "", "", "1.23", "1.23"])
+            files.append(path)
+
+    return files, total_rows
+
+
+def write_projects_file(path: str, projects: int) -> List[Tuple[str, str]]:
+    """projects.txt con `projects` líneas Nombre,ID"""
+    entries = [(f"Bench project {idx:05d}", f"bench-project-{idx:05d}") for idx in range(projects)]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("# --- PROYECTOS SINTÉTICOS ---\n")
+        for name, project_id in entries:
+            f.write(f"{name},{project_id}\n")
+    return entries
+
+
+def write_assets_file(path: str) -> List[str]:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("# --- TIPOS SINTÉTICOS ---\n")
+        for asset_type in ASSET_TYPES:
+            f.write(f"{asset_type}\n")
+    return list(ASSET_TYPES)
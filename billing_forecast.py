@@ -0,0 +1,149 @@
+"""
+Métricas de tendencia para el consolidado de billing (MoM Change %, Next Month Forecast, Next Month Growth %).
+
+Trabaja sobre la matriz proyectos × meses completa: cada modelo recibe las columnas de la ventana
+de meses (una lista de valores por mes) y devuelve la proyección y el crecimiento de todos los
+proyectos en una sola pasada. Para agregar un modelo basta con registrarlo con @register_model.
+"""
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Umbrales para evitar porcentajes/proyecciones irreales por bases muy pequeñas
+MIN_PREV_SUBTOTAL_FOR_PCT = 10.0  # USD
+MIN_SUBTOTAL_FOR_FORECAST = 10.0  # USD
+
+DEFAULT_MODEL = "cmgr"
+DEFAULT_LOOKBACK = 3  # meses
+
+Column = Sequence[float]
+Forecast = Tuple[List[Optional[float]], List[Optional[float]]]  # (proyección, crecimiento %)
+
+FORECAST_MODELS: Dict[str, Callable[[List[Column]], Forecast]] = {}
+
+
+def register_model(name: str):
+    def decorator(model: Callable[[List[Column]], Forecast]):
+        FORECAST_MODELS[name] = model
+        return model
+    return decorator
+
+
+@register_model("cmgr")
+def cmgr_model(window: List[Column]) -> Forecast:
+    """
+    Reglas originales: tasa mensual compuesta (CMGR) entre el primer y el último mes de la ventana
+    cuando ambos superan MIN_SUBTOTAL_FOR_FORECAST; si no, tendencia lineal con los dos últimos meses,
+    crecimiento conservador del 5% o mantener el último valor.
+    CMGR = (last/first)^(1/(n-1)) - 1  ;  proyección = last * (1 + CMGR)
+    """
+    n = len(window)
+    firsts, prevs, lasts = window[0], window[-2], window[-1]
+    projected: List[Optional[float]] = []
+    growth: List[Optional[float]] = []
+
+    for first_val, prev_val, last_val in zip(firsts, prevs, lasts):
+        if n >= 3 and first_val >= MIN_SUBTOTAL_FOR_FORECAST and last_val >= MIN_SUBTOTAL_FOR_FORECAST:
+            cmgr = (last_val / first_val) ** (1.0 / (n - 1)) - 1.0
+            projected.append(last_val * (1.0 + cmgr))
+            growth.append(cmgr * 100.0)
+        elif prev_val >= MIN_SUBTOTAL_FOR_FORECAST and last_val >= MIN_SUBTOTAL_FOR_FORECAST:
+            # Tendencia lineal en USD usando los últimos 2 meses
+            delta = last_val - prev_val
+            projected.append(max(0.0, last_val + delta))
+            growth.append((delta / last_val) * 100.0)
+        elif last_val >= MIN_SUBTOTAL_FOR_FORECAST:
+            # El último mes es relevante pero el anterior es pequeño: crecimiento conservador o mantener
+            if prev_val > 0:
+                projected.append(last_val * 1.05)
+                growth.append(5.0)
+            else:
+                projected.append(last_val)
+                growth.append(0.0)
+        elif last_val > 0 and prev_val > 0:
+            # Ambos meses pequeños pero con tendencia: lineal igual
+            delta = last_val - prev_val
+            projected.append(max(0.0, last_val + delta))
+            growth.append((delta / last_val) * 100.0)
+        elif last_val > 0:
+            # Solo el último mes tiene valor: se mantiene
+            projected.append(last_val)
+            growth.append(0.0)
+        else:
+            projected.append(None)
+            growth.append(None)
+    return projected, growth
+
+
+@register_model("moving_average")
+def moving_average_model(window: List[Column]) -> Forecast:
+    """Promedio simple de los meses de la ventana"""
+    n = len(window)
+    projected: List[Optional[float]] = []
+    growth: List[Optional[float]] = []
+    for values in zip(*window):
+        average = sum(values) / n
+        last_val = values[-1]
+        projected.append(average)
+        growth.append((average - last_val) / last_val * 100.0 if last_val > 0 else None)
+    return projected, growth
+
+
+@register_model("linear_trend")
+def linear_trend_model(window: List[Column]) -> Forecast:
+    """Tendencia por mínimos cuadrados sobre la ventana, evaluada en el mes siguiente"""
+    n = len(window)
+    xs = range(n)
+    x_mean = (n - 1) / 2.0
+    x_var = sum((x - x_mean) ** 2 for x in xs)
+    projected: List[Optional[float]] = []
+    growth: List[Optional[float]] = []
+    for values in zip(*window):
+        y_mean = sum(values) / n
+        slope = sum((x - x_mean) * (y - y_mean) for x, y in zip(xs, values)) / x_var
+        forecast = max(0.0, y_mean + slope * (n - x_mean))
+        last_val = values[-1]
+        projected.append(forecast)
+        growth.append((forecast - last_val) / last_val * 100.0 if last_val > 0 else None)
+    return projected, growth
+
+
+def mom_change(prevs: Column, lasts: Column) -> List[str]:
+    """Cambio porcentual entre el penúltimo y el último mes"""
+    changes = []
+    for prev_val, last_val in zip(prevs, lasts):
+        # Solo evitar si el valor previo es exactamente 0 o muy pequeño (< $0.01)
+        if prev_val > 0.01:
+            changes.append(f"{(last_val - prev_val) / prev_val * 100.0:.2f}%")
+        elif prev_val == 0.0 and last_val > 0:
+            # Pasó de 0 a un valor positivo: crecimiento no definido
+            changes.append("N/A")
+        else:
+            changes.append("")
+    return changes
+
+
+def forecast_metrics(
+    columns: List[Column], model: str = DEFAULT_MODEL, lookback: int = DEFAULT_LOOKBACK
+) -> List[Tuple[str, str, str]]:
+    """
+    Calcula (MoM Change %, Next Month Forecast, Next Month Growth %) ya formateados para cada fila
+    de la matriz proyectos × meses, recibida como columnas por mes en orden cronológico.
+    `lookback` define cuántos de los últimos meses usa el modelo.
+    """
+    if model not in FORECAST_MODELS:
+        raise ValueError(f"Modelo de proyección desconocido: {model} (usa: {', '.join(FORECAST_MODELS)})")
+
+    if len(columns) < 2:
+        return [("", "", "")] * (len(columns[0]) if columns else 0)
+
+    window = columns[-max(2, lookback):]
+    changes = mom_change(columns[-2], columns[-1])
+    projected, growth = FORECAST_MODELS[model](window)
+
+    return [
+        (
+            change,
+            "" if value is None else f"{value:.2f}",
+            "" if pct is None else f"{pct:.2f}%",
+        )
+        for change, value, pct in zip(changes, projected, growth)
+    ]
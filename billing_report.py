@@ -1,87 +1,533 @@
 import os
 import csv
-from datetime import datetime
-from google.cloud import asset_v1
-from google.cloud import bigquery
-from google.cloud import resourcemanager_v3
-from google.cloud import billing_v1
+import json
+import time
+import argparse
+import importlib
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta
+from cost_store import CURRENT_MONTH_TTL, CostStore
+from result_cache import ResultCache, write_json_atomic
+from run_metrics import RunMetrics, file_size, run_profiled
+from projects_config import load_projects
+from call_policy import (
+    DEFAULT_CALL_DEADLINE, DEFAULT_CALL_TIMEOUT, DEFAULT_MAX_ATTEMPTS,
+    CallDeadlineExceeded, CallPolicy, Deadline, describe_failure, status_code,
+)
 
 # --- CONFIGURACIÓN ---
 BILLING_TABLE = "sb-ecosistemaanalitico-lago.daily_cost.gcp_billing_export_v1_01C684_6EFEC0_1C9725"
+# Ventana de meses del reporte: los N meses de factura que terminan en el mes en curso (o en --end-month)
+DEFAULT_COST_MONTHS = 3
+MONTH_ABBREVIATIONS = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
 
-def load_projects(filename="projects.txt", separator=","):
-    projects = []
-    try:
-        with open(filename, "r") as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith("#") and separator in line:
-                    parts = line.split(separator)
-                    projects.append((parts[0].strip(), parts[1].strip()))
-        return projects
-    except FileNotFoundError:
-        print(f"❌ Archivo {filename} no encontrado.")
-        return []
+# Poda de particiones: la tabla del export está particionada por día de carga (_PARTITIONTIME), no por
+# invoice.month. Se leen solo las particiones de los meses pedidos más un margen: el día previo (el mes de
+# factura va en hora del Pacífico) y los días siguientes al cierre, donde llegan cargos tardíos y ajustes.
+BILLING_PARTITION_COLUMN = "_PARTITIONTIME"
+PARTITION_DAYS_BEFORE = 1
+PARTITION_DAYS_AFTER = 10
+
+# Tope de bytes facturados por la consulta de costos (0 = sin tope); se valida antes con un dry run
+MAX_BYTES_BILLED = 100 * 1024 ** 3
+
+# Concurrencia: proyectos procesados en paralelo y llamadas por segundo por API (0 = sin límite)
+MAX_WORKERS = 16
+API_RATE_LIMITS = {"billing": 10, "projects": 10, "assets": 5}
+
+# Conteo de recursos: página máxima de search_all_resources y timeout máximo por página
+SEARCH_PAGE_SIZE = 500
+SEARCH_TIMEOUT = 60
+
+# Tiempos por etapa, latencia por llamada a cada API y contadores; se guardan junto al reporte
+metrics = RunMetrics("billing_report")
+
+# Reintentos con backoff, deadlines por llamada y por ejecución y circuit breaker por API
+call_policy = CallPolicy(metrics)
+
+class RateLimiter:
+    """Espacia las llamadas a una API para no superar `rate` llamadas por segundo entre todos los hilos"""
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if delay > 0:
+            metrics.add("rate_limit_wait_seconds", delay)
+            time.sleep(delay)
+
+# --- CLIENTES COMPARTIDOS ---
+def google_cloud(name):
+    """Módulo google.cloud.<name>, importado en el primer uso: --help, --offline o una ejecución
+    que no consulta todas las APIs no pagan la carga de las librerías que no usan"""
+    return importlib.import_module(f"google.cloud.{name}")
+
+# Cada cliente se crea una sola vez por proceso y se reutiliza entre hilos
+CLIENT_FACTORIES = {
+    "billing": lambda: google_cloud("billing_v1").CloudBillingClient(),
+    "projects": lambda: google_cloud("resourcemanager_v3").ProjectsClient(),
+    "assets": lambda: google_cloud("asset_v1").AssetServiceClient(),
+    "bigquery": lambda: google_cloud("bigquery").Client(),
+}
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(api):
+    """Devuelve el cliente compartido de la API, creándolo en el primer uso"""
+    client = _clients.get(api)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(api)
+            if client is None:
+                client = _clients[api] = CLIENT_FACTORIES[api]()
+    return client
+
+# --- CACHÉ DE CUENTAS DE FACTURACIÓN ---
+BILLING_CACHE_TTL = 24 * 3600  # segundos
+
+class BillingAccountCache:
+    """Nombres de cuentas de facturación por ID, con TTL y persistencia opcional en un JSON"""
+    def __init__(self, path=None, ttl=BILLING_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.entries = {}  # billing_id -> (display_name, fetched_at)
+        self.lock = threading.Lock()
+        self.key_locks = {}
+        if path:
+            self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.entries = {k: (v[0], v[1]) for k, v in data.items()}
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+    def save(self):
+        if not self.path:
+            return
+        # Copia bajo el lock: otros hilos (o pedidos del servicio) pueden estar agregando cuentas
+        with self.lock:
+            data = {k: list(v) for k, v in self.entries.items()}
+        write_json_atomic(self.path, data, indent=2)
+
+    def get(self, billing_id, fetch):
+        """Devuelve el nombre cacheado o lo consulta con `fetch(billing_id)` una sola vez por cuenta"""
+        with self.lock:
+            key_lock = self.key_locks.setdefault(billing_id, threading.Lock())
+        # Un lock por cuenta: si varios hilos piden la misma cuenta, solo uno la consulta
+        with key_lock:
+            entry = self.entries.get(billing_id)
+            if entry and time.time() - entry[1] < self.ttl:
+                return entry[0]
+            display_name = fetch(billing_id)
+            with self.lock:
+                self.entries[billing_id] = (display_name, time.time())
+            return display_name
+
+billing_accounts = BillingAccountCache()
+
+# --- CACHÉ DE RESULTADOS POR PROYECTO ---
+# Sin TTLs no cachea nada: cada ejecución del script consulta todo. Con --project-cache (y en report_service.py)
+# cada campo vale lo que indica su TTL; con --offline se sirve lo guardado sin consultar las APIs.
+PROJECT_CACHE_TTLS = {
+    "billing": 3600,
+    "created_at": 24 * 3600,
+    "resources": 900,
+    "resource_counts": 900,
+}
+project_cache = ResultCache()
+
+def fetch_field(field, p_id, limiter, fetch):
+    """`fetch(p_id)` pasando por la caché de resultados; solo las consultas reales esperan al limitador"""
+    def fetch_limited(project_id):
+        limiter.wait()
+        return fetch(project_id)
+    return project_cache.get(field, p_id, fetch_limited)
 
 def get_billing_details(project_id):
-    """Obtiene el ID y el Nombre de la cuenta de facturación"""
-    client = billing_v1.CloudBillingClient()
+    """Obtiene el ID y el Nombre de la cuenta de facturación.
+    Los errores transitorios se reintentan; si la consulta falla del todo, el error se propaga."""
+    client = get_client("billing")
+    name = f"projects/{project_id}"
     try:
-        name = f"projects/{project_id}"
-        info = client.get_project_billing_info(name=name)
-        if info.billing_enabled:
-            # Obtenemos el ID de la cuenta
-            billing_id = info.billing_account_name.split('/')[-1]
-            # Consultamos el nombre amigable de esa cuenta
-            account_info = client.get_billing_account(name=f"billingAccounts/{billing_id}")
-            return account_info.display_name, billing_id
-        return "Facturación Desactivada", "N/A"
-    except Exception:
-        return "Sin Acceso", "N/A"
+        info = call_policy.call(
+            "billing", "billing.get_project_billing_info",
+            lambda timeout: client.get_project_billing_info(name=name, timeout=timeout),
+        )
+    except Exception as e:
+        # Sin permisos sobre la facturación del proyecto: es una respuesta válida, no un fallo
+        if status_code(e) == 403:
+            return "Sin Acceso", "N/A"
+        raise
+    if info.billing_enabled:
+        # Obtenemos el ID de la cuenta
+        billing_id = info.billing_account_name.split('/')[-1]
+        # Consultamos el nombre amigable de esa cuenta (una vez por cuenta gracias a la caché)
+        display_name = billing_accounts.get(billing_id, get_billing_account_name)
+        return display_name, billing_id
+    return "Facturación Desactivada", "N/A"
 
-def get_project_details(project_id):
-    client = resourcemanager_v3.ProjectsClient()
+def get_billing_account_name(billing_id):
+    client = get_client("billing")
     try:
-        name = f"projects/{project_id}"
-        project = client.get_project(name=name)
-        return project.create_time.strftime('%Y-%m-%d')
-    except Exception:
-        return "N/A"
+        account = call_policy.call(
+            "billing", "billing.get_billing_account",
+            lambda timeout: client.get_billing_account(name=f"billingAccounts/{billing_id}", timeout=timeout),
+        )
+    except Exception as e:
+        # Se ve la facturación del proyecto pero no la cuenta: respuesta válida, queda en caché como las demás
+        if status_code(e) == 403:
+            return "Sin Acceso"
+        raise
+    return account.display_name
+
+def get_project_details(project_id):
+    client = get_client("projects")
+    name = f"projects/{project_id}"
+    project = call_policy.call(
+        "projects", "projects.get_project",
+        lambda timeout: client.get_project(name=name, timeout=timeout),
+    )
+    return project.create_time.strftime('%Y-%m-%d')
+
+def search_resources_minimal(project_id, fields, timeout=SEARCH_TIMEOUT):
+    """Pagina search_all_resources pidiendo solo `fields` y con el tamaño de página máximo"""
+    client = get_client("assets")
+    request = {
+        "scope": f"projects/{project_id}",
+        "page_size": SEARCH_PAGE_SIZE,
+        "read_mask": {"paths": fields},
+    }
+    page_timeout = min(SEARCH_TIMEOUT, timeout) if timeout else SEARCH_TIMEOUT
+    return client.search_all_resources(request=request, timeout=page_timeout)
+
+def timed_project_pages(project_id, fields, timeout, budget):
+    """Páginas del proyecto: `timeout` es el de cada página y `budget` (el deadline de la llamada o de la
+    ejecución) acota el recorrido completo; si se agota entre páginas se corta el conteo"""
+    response = search_resources_minimal(project_id, fields, timeout)
+    for page in metrics.timed_pages("assets.search_all_resources.page", response.pages):
+        yield page
+        if budget.expired():
+            raise CallDeadlineExceeded(f"conteo de recursos de {project_id} excedió el deadline de la llamada")
 
 def get_total_resources(project_id):
-    client = asset_v1.AssetServiceClient()
-    scope = f"projects/{project_id}"
+    # Contamos por página: no hace falta recorrer cada recurso
+    budget = call_policy.call_budget()
+    return call_policy.call(
+        "assets", "assets.search_all_resources",
+        lambda timeout: sum(len(page.results) for page in timed_project_pages(project_id, ["name"], timeout, budget)),
+    )
+
+def get_resource_counts(project_id):
+    """Conteo de recursos del proyecto por tipo de activo"""
+    budget = call_policy.call_budget()
+    return call_policy.call(
+        "assets", "assets.search_all_resources",
+        lambda timeout: dict(Counter(
+            asset.asset_type
+            for page in timed_project_pages(project_id, ["name", "asset_type"], timeout, budget)
+            for asset in page.results
+        )),
+    )
+
+def format_resource_counts(counts):
+    return ";".join(f"{asset_type}={n}" for asset_type, n in sorted(counts.items()))
+
+class QueryTooExpensive(Exception):
+    """El dry run estima más bytes que el tope configurado: la consulta real no se ejecuta"""
+
+def format_bytes(n):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if n < 1024:
+            return f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TiB"
+
+def partition_range(months):
+    """Rango [inicio, fin) de particiones que cubre los meses YYYYMM pedidos, con sus márgenes"""
+    firsts = [date(int(m[:4]), int(m[4:6]), 1) for m in months]
+    last = max(firsts)
+    next_month = date(last.year + last.month // 12, last.month % 12 + 1, 1)
+    return (
+        min(firsts) - timedelta(days=PARTITION_DAYS_BEFORE),
+        next_month + timedelta(days=PARTITION_DAYS_AFTER),
+    )
+
+def billing_month(value):
+    """Valida un mes de factura YYYYMM (tipo de argparse para --end-month); retorna el mes normalizado"""
     try:
-        response = client.search_all_resources(request={"scope": scope}, timeout=60)
-        return sum(1 for _ in response)
-    except Exception:
-        return 0
+        return datetime.strptime(value, "%Y%m").strftime("%Y%m")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"mes inválido '{value}': usa el formato YYYYMM (p. ej. 202601)")
 
-def get_project_costs(project_id):
-    client = bigquery.Client()
-    months = ["202601", "202512", "202511"]
-    costs = {m: 0.0 for m in months}
+def cost_months(count=DEFAULT_COST_MONTHS, end_month=None):
+    """Los `count` meses YYYYMM que terminan en `end_month` (por defecto el mes en curso), del más reciente al más antiguo"""
+    end_month = end_month or datetime.now().strftime("%Y%m")
+    year, month = int(end_month[:4]), int(end_month[4:6])
+    months = []
+    for _ in range(max(1, count)):
+        months.append(f"{year:04d}{month:02d}")
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    return months
+
+def cost_column(month):
+    """'202601' -> 'COST_JAN_2026'"""
+    return f"COST_{MONTH_ABBREVIATIONS[int(month[4:6]) - 1]}_{month[:4]}"
+
+def get_projects_costs(project_ids, months=None, max_bytes_billed=MAX_BYTES_BILLED):
+    """Obtiene los costos mensuales de todos los proyectos en una sola consulta.
+    Antes de ejecutarla, un dry run estima los bytes a procesar; si superan `max_bytes_billed` no se ejecuta.
+    Si la consulta falla tras los reintentos el error se propaga: no se devuelven costos en cero."""
+    bigquery = google_cloud("bigquery")
+    client = get_client("bigquery")
+    months = months or cost_months()
+    costs = {p_id: {m: 0.0 for m in months} for p_id in project_ids}
+    partition_start, partition_end = partition_range(months)
     query = f"""
         SELECT 
+            project.id as project_id,
             invoice.month as month, 
             ROUND(SUM(cost + (SELECT IFNULL(SUM(c.amount), 0) FROM UNNEST(credits) c)), 2) as total_cost
         FROM `{BILLING_TABLE}`
-        WHERE project.id = '{project_id}'
-        AND invoice.month IN ({','.join([f"'{m}'" for m in months])})
-        GROUP BY 1
+        WHERE {BILLING_PARTITION_COLUMN} >= TIMESTAMP(@partition_start)
+        AND {BILLING_PARTITION_COLUMN} < TIMESTAMP(@partition_end)
+        AND project.id IN UNNEST(@project_ids)
+        AND invoice.month IN UNNEST(@months)
+        GROUP BY 1, 2
     """
-    try:
-        query_job = client.query(query)
-        for row in query_job:
-            costs[row.month] = row.total_cost
-    except Exception:
-        pass
+    query_parameters = [
+        bigquery.ScalarQueryParameter("partition_start", "DATE", partition_start),
+        bigquery.ScalarQueryParameter("partition_end", "DATE", partition_end),
+        bigquery.ArrayQueryParameter("project_ids", "STRING", list(costs)),
+        bigquery.ArrayQueryParameter("months", "STRING", list(months)),
+    ]
+
+    def dry_run(timeout):
+        job_config = bigquery.QueryJobConfig(query_parameters=query_parameters, dry_run=True, use_query_cache=False)
+        return client.query(query, job_config=job_config, timeout=timeout).total_bytes_processed or 0
+
+    estimated = call_policy.call("bigquery", "bigquery.dry_run", dry_run)
+    metrics.add("bigquery_bytes_estimated", estimated)
+    print(f"📏 Consulta de costos: ~{format_bytes(estimated)} a procesar "
+          f"(particiones {partition_start} a {partition_end - timedelta(days=1)})")
+    if max_bytes_billed and estimated > max_bytes_billed:
+        raise QueryTooExpensive(
+            f"la consulta procesaría {format_bytes(estimated)}, más que el tope de {format_bytes(max_bytes_billed)}"
+        )
+
+    # BigQuery también aplica el tope: si la estimación se quedó corta, el job falla sin facturar
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=query_parameters,
+        maximum_bytes_billed=int(max_bytes_billed) if max_bytes_billed else None,
+    )
+
+    def run_query(timeout):
+        with metrics.call("bigquery.query"):
+            query_job = client.query(query, job_config=job_config, timeout=timeout)
+        # La espera del job se mide aparte del envío de la consulta
+        with metrics.call("bigquery.result"):
+            rows = list(query_job.result(timeout=timeout))
+        metrics.add("bigquery_bytes_processed", query_job.total_bytes_processed or 0)
+        metrics.add("bigquery_bytes_billed", getattr(query_job, "total_bytes_billed", None) or 0)
+        return rows
+
+    for row in call_policy.call("bigquery", "bigquery.costs", run_query):
+        costs[row.project_id][row.month] = row.total_cost
     return costs
 
-def generate_billing_report():
-    raw_data = load_projects()
+def get_project_costs(project_id):
+    return get_projects_costs([project_id])[project_id]
+
+def lookup(status, api, fetch, *args, default=""):
+    """Ejecuta una consulta del proyecto; si falla deja `default` en la fila y anota el motivo en `status`"""
+    try:
+        return fetch(*args)
+    except Exception as e:
+        status.append(f"{api}:{describe_failure(e)}")
+        metrics.add(f"failed.{api}")
+        return default
+
+def collect_project_row(p_name, p_id, limiters, months, all_costs, resource_breakdown=False, costs_status=None,
+                        resources=None, count_resources=True):
+    """Consulta los datos de un proyecto y arma su fila del reporte con un costo por mes de `months`.
+    Las consultas fallidas quedan vacías y se listan en la columna STATUS (OK si no hubo fallos).
+    Con `resources` = (conteo por tipo, error) el conteo viene de un barrido ya hecho y no se consulta la API;
+    con `count_resources` en False no se cuentan los recursos y la fila no lleva esas columnas."""
+    print(f"📊 Procesando: {p_name}...")
+    status = []
+
+    b_name, b_id = lookup(
+        status, "billing", fetch_field, "billing", p_id, limiters["billing"], get_billing_details, default=("", "")
+    )
+    creation_date = lookup(status, "projects", fetch_field, "created_at", p_id, limiters["projects"], get_project_details)
+    resource_counts = total_res = None
+    if count_resources and resources is not None:
+        resource_counts, error = resources
+        if error is not None:
+            # Un conteo parcial no es el total del proyecto
+            resource_counts = None
+            status.append(f"assets:{describe_failure(error)}")
+            metrics.add("failed.assets")
+        total_res = "" if resource_counts is None else sum(resource_counts.values())
+    elif count_resources and resource_breakdown:
+        resource_counts = lookup(
+            status, "assets", fetch_field, "resource_counts", p_id, limiters["assets"], get_resource_counts, default=None
+        )
+        total_res = "" if resource_counts is None else sum(resource_counts.values())
+    elif count_resources:
+        total_res = lookup(status, "assets", fetch_field, "resources", p_id, limiters["assets"], get_total_resources)
+
+    # Los meses sin dato (la consulta falló y no estaban en el almacén) quedan vacíos en lugar de ceros
+    costs = all_costs.get(p_id, {})
+    if any(month not in costs for month in months):
+        status.append(costs_status or "bigquery:sin_datos")
+
+    row = [
+        b_name,
+        b_id,
+        p_name, 
+        p_id,
+        creation_date, 
+    ]
+    if count_resources:
+        row.append(total_res)
+    row.extend(costs.get(month, "") for month in months)
+    if count_resources and resource_breakdown:
+        row.append("" if resource_counts is None else format_resource_counts(resource_counts))
+    row.append(";".join(status) or "OK")
+    return row
+
+def fetch_all_costs(projects_list, months, store_path=None, store_ttl=CURRENT_MONTH_TTL,
+                    max_bytes_billed=MAX_BYTES_BILLED, store=None, offline=False):
+    """
+    Costos de los proyectos en los meses pedidos, leídos del almacén local. Solo los pares (proyecto, mes)
+    que faltan o están vencidos se piden a BigQuery, en una sola consulta; con `offline` no se consulta nada.
+    Con `store` se usa ese almacén ya abierto (y no se cierra) en lugar de abrir `store_path`.
+    Retorna (costos, estado); si la consulta falla, los pares que no estaban guardados quedan sin dato.
+    """
+    project_ids = [p_id for _, p_id in projects_list]
+    costs_status = None
+    opened = nullcontext(store) if store is not None else CostStore(store_path, store_ttl)
+    with metrics.stage("costs_query"), opened as store:
+        stale = store.stale_pairs(project_ids, months)
+        metrics.add("cost_cells_from_store", len(project_ids) * len(months) - len(stale))
+        if stale and offline:
+            # Se usan los valores guardados aunque estén vencidos; los que nunca se consultaron quedan vacíos
+            print(f"💰 Sin conexión: {len(stale)} costos faltan o están vencidos en el almacén local")
+        elif stale:
+            stale_projects = sorted({p_id for p_id, _ in stale})
+            stale_months = sorted({month for _, month in stale}, reverse=True)
+            print(f"💰 Consultando costos de {len(stale_projects)} proyectos en {len(stale_months)} meses...")
+            try:
+                store.store(get_projects_costs(stale_projects, stale_months, max_bytes_billed))
+            except Exception as e:
+                costs_status = f"bigquery:{describe_failure(e)}"
+                metrics.add("failed.bigquery")
+                print(f"⚠️ No se pudieron consultar los costos ({costs_status}): {e}")
+        else:
+            print(f"💰 Costos de {len(project_ids)} proyectos servidos desde el almacén local")
+        return store.costs(project_ids, months), costs_status
+
+def build_limiters(rate_limits=None):
+    rates = {**API_RATE_LIMITS, **(rate_limits or {})}
+    return {api: RateLimiter(rate) for api, rate in rates.items()}
+
+def write_billing_report(filename, projects_list, limiters, months, all_costs, costs_status=None,
+                         resource_breakdown=False, max_workers=MAX_WORKERS, resources=None, count_resources=True):
+    """Escribe el CSV del reporte con una columna de costo por mes de `months`;
+    `resources` (uno por proyecto) reemplaza el conteo vía API y `count_resources` en False lo omite"""
+    with open(filename, mode='w', newline='', encoding='utf-8') as file:
+        write_billing_csv(
+            file, projects_list, limiters, months, all_costs, costs_status, resource_breakdown, max_workers, resources,
+            count_resources,
+        )
+
+def write_billing_csv(file, projects_list, limiters, months, all_costs, costs_status=None,
+                      resource_breakdown=False, max_workers=MAX_WORKERS, resources=None, count_resources=True):
+    """Como write_billing_report, pero sobre un archivo ya abierto (o un buffer en memoria)"""
+    writer = csv.writer(file)
+    # Nueva columna a la izquierda: BILLING_ACCOUNT_NAME
+    header = [
+        "BILLING_ACCOUNT_NAME",
+        "BILLING_ACCOUNT_ID",
+        "PROJECT_NAME", 
+        "PROJECT_ID",
+        "CREATED_AT",
+    ]
+    if count_resources:
+        header.append("TOTAL_RESOURCES")
+    header.extend(cost_column(month) for month in months)
+    if count_resources and resource_breakdown:
+        header.append("RESOURCES_BY_TYPE")
+    header.append("STATUS")
+    writer.writerow(header)
+
+    project_resources = resources if resources is not None else [None] * len(projects_list)
+    # Los proyectos se consultan en paralelo; map() devuelve las filas en el orden de projects.txt
+    with metrics.stage("projects"), ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        rows = executor.map(
+            lambda p, res: collect_project_row(
+                p[0], p[1], limiters, months, all_costs, resource_breakdown, costs_status, res, count_resources
+            ),
+            projects_list,
+            project_resources,
+        )
+        for row in rows:
+            writer.writerow(row)
+            metrics.add("rows_written")
+            if row[-1] != "OK":
+                metrics.add("rows_with_errors")
+
+def write_run_metrics(filename, projects, max_workers):
+    """Guarda las métricas de la ejecución junto al reporte"""
+    metrics.add("bytes_written", file_size(filename))
+    metrics.set_info(report=filename, projects=projects, workers=max_workers)
+    metrics.write(filename)
+
+def generate_billing_report(max_workers=MAX_WORKERS, rate_limits=None,
+                            billing_cache_path=None, billing_cache_ttl=BILLING_CACHE_TTL,
+                            resource_breakdown=False, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                            call_timeout=DEFAULT_CALL_TIMEOUT, call_deadline=DEFAULT_CALL_DEADLINE,
+                            run_deadline=None, max_bytes_billed=MAX_BYTES_BILLED,
+                            months_count=DEFAULT_COST_MONTHS, end_month=None,
+                            cost_store_path=None, cost_store_ttl=CURRENT_MONTH_TTL,
+                            include_costs=True, include_resources=True, project_cache_path=None, offline=False):
+    """
+    `include_costs` / `include_resources` en False omiten la consulta a BigQuery / el conteo de recursos
+    y sus columnas. Con `project_cache_path` los datos de cada proyecto se guardan entre ejecuciones; con
+    `offline` el reporte sale solo de las cachés locales (proyectos y almacén de costos) y no se
+    carga ninguna librería de Google.
+    """
+    metrics.reset()
+    call_policy.reset(max_attempts, call_timeout, call_deadline, run_deadline)
+    with metrics.stage("load_projects"):
+        raw_data = load_projects()
     if not raw_data: return
 
+    if billing_cache_path:
+        billing_accounts.path = billing_cache_path
+        billing_accounts.load()
+    billing_accounts.ttl = billing_cache_ttl
+
+    project_cache.offline = offline
+    project_cache.ttls = dict(PROJECT_CACHE_TTLS) if project_cache_path else {}
+    if project_cache_path:
+        project_cache.load(project_cache_path)
+    elif offline:
+        print("⚠️ --offline sin --project-cache: facturación, fecha de creación y recursos quedarán vacíos")
+
     projects_list = list(raw_data)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M")
     
@@ -92,45 +538,166 @@ def generate_billing_report():
 
     print(f"🚀 Generando reporte consolidado en {filename}...")
 
-    try:
-        with open(filename, mode='w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            # Nueva columna a la izquierda: BILLING_ACCOUNT_NAME
-            writer.writerow([
-                "BILLING_ACCOUNT_NAME",
-                "BILLING_ACCOUNT_ID",
-                "PROJECT_NAME", 
-                "PROJECT_ID",
-                "CREATED_AT",
-                "TOTAL_RESOURCES", 
-                "COST_JAN_2026", 
-                "COST_DEC_2025", 
-                "COST_NOV_2025"
-            ])
-
-            for p_name, p_id in projects_list:
-                print(f"📊 Procesando: {p_name}...")
-                
-                b_name, b_id = get_billing_details(p_id)
-                creation_date = get_project_details(p_id)
-                total_res = get_total_resources(p_id)
-                costs = get_project_costs(p_id)
-                
-                writer.writerow([
-                    b_name,
-                    b_id,
-                    p_name, 
-                    p_id,
-                    creation_date, 
-                    total_res, 
-                    costs.get("202601", 0), 
-                    costs.get("202512", 0), 
-                    costs.get("202511", 0)
-                ])
+    months, all_costs, costs_status = [], {}, None
+    if include_costs:
+        months = cost_months(months_count, end_month)
+        all_costs, costs_status = fetch_all_costs(
+            projects_list, months, cost_store_path, cost_store_ttl, max_bytes_billed, offline=offline
+        )
+    limiters = build_limiters(rate_limits)
 
+    try:
+        write_billing_report(
+            filename, projects_list, limiters, months, all_costs, costs_status, resource_breakdown, max_workers,
+            count_resources=include_resources,
+        )
+        billing_accounts.save()
+        if project_cache_path and not offline:
+            project_cache.save(project_cache_path)
+        write_run_metrics(filename, len(projects_list), max_workers)
         print(f"✅ Reporte finalizado exitosamente.")
     except Exception as e:
         print(f"❌ Error crítico: {e}")
 
 if __name__ == "__main__":
-    generate_billing_report()
\ No newline at end of file
+    parser = argparse.ArgumentParser(
+        description="Genera el reporte consolidado de facturación por proyecto"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=MAX_WORKERS,
+        help=f"Proyectos consultados en paralelo (default: {MAX_WORKERS})",
+    )
+    for api, rate in API_RATE_LIMITS.items():
+        parser.add_argument(
+            f"--{api}-qps",
+            type=float,
+            default=rate,
+            help=f"Máximo de llamadas por segundo a la API de {api}, 0 = sin límite (default: {rate})",
+        )
+    parser.add_argument(
+        "--billing-cache",
+        type=str,
+        default=None,
+        help="Archivo JSON donde persistir los nombres de cuentas de facturación entre ejecuciones",
+    )
+    parser.add_argument(
+        "--billing-cache-ttl",
+        type=int,
+        default=BILLING_CACHE_TTL,
+        help=f"Segundos de validez de un nombre de cuenta cacheado (default: {BILLING_CACHE_TTL})",
+    )
+    parser.add_argument(
+        "--resource-breakdown",
+        action="store_true",
+        help="Agrega la columna RESOURCES_BY_TYPE con el conteo de recursos por tipo de activo",
+    )
+    parser.add_argument(
+        "--months",
+        type=int,
+        default=DEFAULT_COST_MONTHS,
+        help=f"Meses de costo en el reporte, del más reciente hacia atrás (default: {DEFAULT_COST_MONTHS})",
+    )
+    parser.add_argument(
+        "--end-month",
+        type=billing_month,
+        default=None,
+        help="Último mes de factura del reporte, YYYYMM (default: el mes en curso)",
+    )
+    parser.add_argument(
+        "--cost-store",
+        type=str,
+        default=None,
+        help="Base SQLite donde guardar los costos mensuales; los meses cerrados no se vuelven a consultar",
+    )
+    parser.add_argument(
+        "--cost-store-ttl",
+        type=int,
+        default=CURRENT_MONTH_TTL,
+        help=f"Segundos de validez del costo de un mes aún abierto en el almacén (default: {CURRENT_MONTH_TTL})",
+    )
+    parser.add_argument(
+        "--no-costs",
+        action="store_true",
+        help="No consulta BigQuery: el reporte sale sin columnas de costo",
+    )
+    parser.add_argument(
+        "--no-resources",
+        action="store_true",
+        help="No cuenta los recursos de cada proyecto: el reporte sale sin TOTAL_RESOURCES",
+    )
+    parser.add_argument(
+        "--project-cache",
+        type=str,
+        default=None,
+        help="Archivo JSON donde guardar facturación, fecha de creación y recursos de cada proyecto entre ejecuciones "
+             f"(TTLs: {', '.join(f'{k}={v}s' for k, v in PROJECT_CACHE_TTLS.items())})",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Genera el reporte solo con los datos de --project-cache y --cost-store, "
+             "sin consultar ni cargar las APIs de Google",
+    )
+    parser.add_argument(
+        "--max-bytes-billed",
+        type=int,
+        default=MAX_BYTES_BILLED,
+        help=f"Tope de bytes facturados por la consulta de costos, 0 = sin tope (default: {MAX_BYTES_BILLED})",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=DEFAULT_MAX_ATTEMPTS,
+        help=f"Intentos por llamada ante errores transitorios (429, 5xx, timeouts) (default: {DEFAULT_MAX_ATTEMPTS})",
+    )
+    parser.add_argument(
+        "--call-timeout",
+        type=float,
+        default=DEFAULT_CALL_TIMEOUT,
+        help=f"Timeout en segundos de cada intento (de cada página al contar recursos), 0 = sin límite (default: {DEFAULT_CALL_TIMEOUT:.0f})",
+    )
+    parser.add_argument(
+        "--call-deadline",
+        type=float,
+        default=DEFAULT_CALL_DEADLINE,
+        help=f"Segundos máximos por consulta sumando reintentos y todas las páginas, 0 = sin límite (default: {DEFAULT_CALL_DEADLINE:.0f})",
+    )
+    parser.add_argument(
+        "--run-deadline",
+        type=float,
+        default=None,
+        help="Segundos máximos para toda la ejecución; al agotarse, las consultas pendientes quedan marcadas en STATUS",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        default=None,
+        help="Ejecuta bajo cProfile y guarda las estadísticas en este archivo (.prof)",
+    )
+
+    args = parser.parse_args()
+    rate_limits = {api: getattr(args, f"{api}_qps") for api in API_RATE_LIMITS}
+    run_profiled(
+        args.profile,
+        generate_billing_report,
+        max_workers=args.workers,
+        rate_limits=rate_limits,
+        billing_cache_path=args.billing_cache,
+        billing_cache_ttl=args.billing_cache_ttl,
+        resource_breakdown=args.resource_breakdown,
+        max_attempts=args.max_attempts,
+        call_timeout=args.call_timeout,
+        call_deadline=args.call_deadline,
+        run_deadline=args.run_deadline,
+        max_bytes_billed=args.max_bytes_billed,
+        months_count=args.months,
+        end_month=args.end_month,
+        cost_store_path=args.cost_store,
+        cost_store_ttl=args.cost_store_ttl,
+        include_costs=not args.no_costs,
+        include_resources=not args.no_resources,
+        project_cache_path=args.project_cache,
+        offline=args.offline,
+    )
@@ -0,0 +1,57 @@
+"""
+Almacén compacto de subtotales por proyecto y mes para el consolidado de billing.
+
+En lugar de un dict de dicts con un float por celda, cada proyecto recibe un índice de fila
+(tabla de claves internadas) y cada mes un índice de columna; los montos de cada mes viven en un
+array('d') contiguo que crece al aparecer proyectos nuevos.
+"""
+from array import array
+from typing import Dict, Iterable, List, Tuple
+
+ProjectKey = Tuple[str, str, str, str, str]  # (account_name, account_id, project_name, project_id, project_number)
+
+
+class BillingTotals:
+    def __init__(self) -> None:
+        self.keys: List[ProjectKey] = []
+        self.index: Dict[ProjectKey, int] = {}
+        self.months: List[str] = []
+        self.month_index: Dict[str, int] = {}
+        self.columns: List[array] = []
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def month_column(self, month_key: str) -> array:
+        """Columna del mes (YYYY-MM), creada en ceros si es nueva"""
+        col = self.month_index.get(month_key)
+        if col is None:
+            col = self.month_index[month_key] = len(self.months)
+            self.months.append(month_key)
+            self.columns.append(array("d", bytes(8 * len(self.keys))))
+        return self.columns[col]
+
+    def project_row(self, key: ProjectKey) -> int:
+        """Índice de fila del proyecto; los proyectos nuevos se agregan con ceros en todos los meses"""
+        row = self.index.get(key)
+        if row is None:
+            row = self.index[key] = len(self.keys)
+            self.keys.append(key)
+            for column in self.columns:
+                column.append(0.0)
+        return row
+
+    def add(self, key: ProjectKey, month_key: str, amount: float) -> None:
+        column = self.month_column(month_key)
+        column[self.project_row(key)] += amount
+
+    def add_partial(self, month_key: str, partial: Dict[ProjectKey, float]) -> None:
+        """Suma los subtotales de un archivo (un mes) respetando el orden de aparición de sus claves"""
+        column = self.month_column(month_key)
+        project_row = self.project_row
+        for key, amount in partial.items():
+            row = project_row(key)
+            column[row] += amount
+
+    def month_columns(self, months: Iterable[str]) -> List[array]:
+        return [self.month_column(month_key) for month_key in months]
@@ -0,0 +1,195 @@
+"""
+Política común para las llamadas a las APIs de GCP: reintentos con backoff exponencial y jitter
+solo ante errores transitorios, presupuesto de tiempo por llamada y por ejecución, y un circuit
+breaker por API para dejar de insistir mientras un servicio está caído.
+
+Las funciones que se ejecutan bajo la política reciben el timeout (segundos) que les queda para ese intento,
+o None si no hay ningún límite configurado.
+"""
+import time
+import random
+import threading
+from typing import Callable, Dict, Optional, TypeVar
+
+from run_metrics import RunMetrics
+
+# Códigos HTTP (atributo `code` de google.api_core.exceptions) que vale la pena reintentar
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BASE_DELAY = 0.5  # segundos
+DEFAULT_MAX_DELAY = 8.0  # segundos
+DEFAULT_CALL_TIMEOUT = 30.0  # segundos por intento
+DEFAULT_CALL_DEADLINE = 60.0  # segundos por llamada, sumando reintentos
+DEFAULT_FAILURE_THRESHOLD = 5  # fallos transitorios seguidos que abren el circuito
+DEFAULT_RESET_AFTER = 30.0  # segundos con el circuito abierto antes de una llamada de prueba
+
+T = TypeVar("T")
+
+
+class CallDeadlineExceeded(Exception):
+    """Se agotó el presupuesto de tiempo de la llamada o de la ejecución"""
+
+
+class CircuitOpenError(Exception):
+    """La API acumuló demasiados fallos seguidos y se está dejando descansar"""
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    code = getattr(error, "code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    return isinstance(error, (ConnectionError, TimeoutError)) or status_code(error) in RETRYABLE_CODES
+
+
+def describe_failure(error: BaseException) -> str:
+    """Texto corto para la columna de estado del reporte"""
+    if isinstance(error, CallDeadlineExceeded):
+        return "deadline"
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"
+    return type(error).__name__
+
+
+class Deadline:
+    """Instante límite; sin `seconds` no vence nunca"""
+
+    def __init__(self, seconds: Optional[float] = None) -> None:
+        self.expires_at = time.monotonic() + seconds if seconds else None
+
+    def remaining(self) -> float:
+        return float("inf") if self.expires_at is None else self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+class CircuitBreaker:
+    """Se abre tras `failure_threshold` fallos transitorios seguidos; cada `reset_after` segundos deja pasar una prueba"""
+
+    def __init__(self, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD, reset_after: float = DEFAULT_RESET_AFTER) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at >= self.reset_after:
+                # Medio abierto: pasa esta llamada y las demás siguen fallando rápido hasta la próxima ventana
+                self.opened_at = now
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class CallPolicy:
+    """Reintentos, deadlines y circuit breakers compartidos por todos los hilos de una ejecución"""
+
+    def __init__(
+        self,
+        metrics: RunMetrics,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        call_timeout: float = DEFAULT_CALL_TIMEOUT,
+        call_deadline: float = DEFAULT_CALL_DEADLINE,
+        run_deadline: Optional[float] = None,
+        base_delay: float = DEFAULT_BASE_DELAY,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        reset_after: float = DEFAULT_RESET_AFTER,
+    ) -> None:
+        self.metrics = metrics
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.lock = threading.Lock()
+        self.reset(max_attempts, call_timeout, call_deadline, run_deadline)
+
+    def reset(
+        self,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        call_timeout: float = DEFAULT_CALL_TIMEOUT,
+        call_deadline: float = DEFAULT_CALL_DEADLINE,
+        run_deadline: Optional[float] = None,
+    ) -> None:
+        """Nueva ejecución: arranca el reloj de `run_deadline` y cierra todos los circuitos"""
+        self.max_attempts = max(1, max_attempts)
+        self.call_timeout = call_timeout
+        self.call_deadline = call_deadline
+        self.run = Deadline(run_deadline)
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def breaker(self, api: str) -> CircuitBreaker:
+        with self.lock:
+            breaker = self.breakers.get(api)
+            if breaker is None:
+                breaker = self.breakers[api] = CircuitBreaker(self.failure_threshold, self.reset_after)
+            return breaker
+
+    def call_budget(self) -> Deadline:
+        """
+        Presupuesto completo de una llamada (`call_deadline`, acotado por lo que queda de la ejecución).
+        Lo usan las funciones que paginan: el timeout que reciben vale para cada página, no para todo el recorrido.
+        """
+        seconds = min(self.call_deadline or float("inf"), self.run.remaining())
+        return Deadline(None if seconds == float("inf") else max(seconds, 1e-6))
+
+    def call(self, api: str, name: str, func: Callable[[Optional[float]], T]) -> T:
+        """
+        Ejecuta `func(timeout)` reintentando los errores transitorios dentro del presupuesto de la llamada
+        y de la ejecución. Los errores definitivos (permisos, no encontrado, ...) se propagan de inmediato.
+        """
+        budget = Deadline(self.call_deadline)
+        breaker = self.breaker(api)
+        attempt = 0
+        while True:
+            remaining = min(budget.remaining(), self.run.remaining())
+            if remaining <= 0:
+                self.metrics.add(f"deadline_exceeded.{api}")
+                raise CallDeadlineExceeded(f"{name}: sin tiempo restante")
+            if not breaker.allow():
+                self.metrics.add(f"circuit_open.{api}")
+                raise CircuitOpenError(f"{api}: circuito abierto tras {breaker.failures} fallos seguidos")
+
+            try:
+                timeout = min(self.call_timeout or float("inf"), remaining)
+                with self.metrics.call(name):
+                    result = func(None if timeout == float("inf") else timeout)
+            except CallDeadlineExceeded:
+                # La función agotó el presupuesto de la llamada (p. ej. paginando): cuenta como fallo, pero no hay tiempo para reintentar
+                breaker.record_failure()
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    # La API respondió (aunque sea con un error definitivo): el servicio está disponible
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                attempt += 1
+                # Full jitter: espera aleatoria entre 0 y el backoff exponencial del intento
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+                if attempt >= self.max_attempts or delay >= min(budget.remaining(), self.run.remaining()):
+                    raise
+                self.metrics.add(f"retries.{api}")
+                time.sleep(delay)
+                continue
+
+            breaker.record_success()
+            return result
@@ -0,0 +1,111 @@
+"""
+Almacén local (SQLite) de costos mensuales por proyecto: filas (project_id, invoice_month, cost).
+
+billing_report.py solo consulta a BigQuery los pares (proyecto, mes) que faltan o están vencidos:
+un mes cerrado se guarda una vez y no se vuelve a pedir; el mes en curso, y los recién terminados
+que aún reciben ajustes, se refrescan cuando su dato supera el TTL.
+"""
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Días tras el fin de mes en los que la factura todavía recibe cargos tardíos y ajustes
+MONTH_CLOSE_DAYS = 10
+CURRENT_MONTH_TTL = 6 * 3600  # segundos
+
+MonthCosts = Dict[str, Dict[str, float]]  # project_id -> {invoice_month (YYYYMM): costo}
+
+
+def month_close_time(month: str) -> float:
+    """Instante (epoch) desde el que el mes YYYYMM se considera cerrado"""
+    year, month_num = int(month[:4]), int(month[4:6])
+    next_month = date(year + month_num // 12, month_num % 12 + 1, 1)
+    closed_on = next_month + timedelta(days=MONTH_CLOSE_DAYS)
+    return datetime(closed_on.year, closed_on.month, closed_on.day).timestamp()
+
+
+class CostStore:
+    def __init__(self, path: Optional[str] = None, ttl: float = CURRENT_MONTH_TTL) -> None:
+        """
+        Sin `path` el almacén vive en memoria: cada ejecución consulta todo, como antes.
+        La conexión se puede compartir entre hilos (report_service.py la mantiene abierta): cada acceso toma el lock.
+        """
+        self.path = path or ":memory:"
+        self.ttl = ttl
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS costs (
+                project_id TEXT NOT NULL,
+                invoice_month TEXT NOT NULL,
+                cost REAL NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (project_id, invoice_month)
+            )
+            """
+        )
+
+    def __enter__(self) -> "CostStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def is_fresh(self, month: str, fetched_at: float, now: float) -> bool:
+        close_time = month_close_time(month)
+        if fetched_at >= close_time:
+            # Consultado con el mes ya cerrado: el valor es definitivo
+            return True
+        # Consultado con el mes abierto: vale hasta el TTL y nunca después del cierre
+        return now < close_time and now - fetched_at < self.ttl
+
+    def rows(self, months: Iterable[str]) -> List[Tuple[str, str, float, float]]:
+        months = list(months)
+        placeholders = ",".join("?" * len(months))
+        with self.lock:
+            return self.conn.execute(
+                f"SELECT project_id, invoice_month, cost, fetched_at FROM costs WHERE invoice_month IN ({placeholders})",
+                months,
+            ).fetchall()
+
+    def stale_pairs(self, project_ids: Iterable[str], months: Iterable[str],
+                    now: Optional[float] = None) -> Set[Tuple[str, str]]:
+        """Pares (proyecto, mes) que faltan en el almacén o deben refrescarse"""
+        now = time.time() if now is None else now
+        months = list(months)
+        wanted = {(p_id, month) for p_id in project_ids for month in months}
+        fresh = {
+            (p_id, month)
+            for p_id, month, _, fetched_at in self.rows(months)
+            if self.is_fresh(month, fetched_at, now)
+        }
+        return wanted - fresh
+
+    def store(self, costs: MonthCosts, fetched_at: Optional[float] = None) -> None:
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO costs (project_id, invoice_month, cost, fetched_at) VALUES (?, ?, ?, ?)",
+                [
+                    (p_id, month, float(cost), fetched_at)
+                    for p_id, by_month in costs.items()
+                    for month, cost in by_month.items()
+                ],
+            )
+
+    def costs(self, project_ids: Iterable[str], months: Iterable[str]) -> MonthCosts:
+        """Costos guardados de los proyectos y meses pedidos; los pares nunca consultados no aparecen"""
+        result: MonthCosts = {p_id: {} for p_id in project_ids}
+        for p_id, month, cost, _ in self.rows(months):
+            if p_id in result:
+                result[p_id][month] = cost
+        return result
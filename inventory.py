@@ -1,85 +1,482 @@
 import os
-import csv
+import time
+import queue
+import argparse
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from google.cloud import asset_v1
+from inventory_snapshot import InventorySnapshot
+from inventory_writers import WRITERS, open_inventory_writer
+from projects_config import load_asset_types, load_projects
+from run_metrics import RunMetrics, file_size, run_profiled
 
-def load_projects(filename="projects.txt", separator=","):
-    """Carga pares de (Nombre, ID) desde el archivo txt"""
-    projects = []
+def format_time(value):
+    if not value:
+        return ""
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+def format_labels(labels):
+    return ";".join(f"{k}={v}" for k, v in sorted(labels.items())) if labels else ""
+
+# Columnas disponibles: campo de search_all_resources (se pide en read_mask) y cómo se formatea
+INVENTORY_COLUMNS = {
+    "RESOURCE_NAME": ("display_name", lambda asset: asset.display_name),
+    "SERVICE": ("asset_type", lambda asset: asset.asset_type),
+    "LOCATION": ("location", lambda asset: asset.location),
+    "LABELS": ("labels", lambda asset: format_labels(asset.labels)),
+    "STATE": ("state", lambda asset: asset.state),
+    "CREATE_TIME": ("create_time", lambda asset: format_time(asset.create_time)),
+    "UPDATE_TIME": ("update_time", lambda asset: format_time(asset.update_time)),
+    "PARENT": ("parent_full_resource_name", lambda asset: asset.parent_full_resource_name),
+}
+DEFAULT_COLUMNS = ["RESOURCE_NAME", "SERVICE"]
+
+def read_mask_for(columns, *extra_fields):
+    """Field mask con solo los campos que se van a escribir"""
+    fields = [*extra_fields, *(INVENTORY_COLUMNS[column][0] for column in columns)]
+    return {"paths": list(dict.fromkeys(fields))}
+
+def asset_values(asset, columns):
+    return [INVENTORY_COLUMNS[column][1](asset) for column in columns]
+
+# Campos mínimos para el modo incremental: listado de nombres vivos y detalle de los modificados.
+# El snapshot guarda todas las columnas para poder materializar cualquier selección.
+LIVE_FIELDS = ["name", "project"]
+SNAPSHOT_FIELDS = read_mask_for(INVENTORY_COLUMNS, "name", "project")["paths"]
+
+# Exportación por proyecto: proyectos paginados en paralelo y páginas en memoria por proyecto
+INVENTORY_WORKERS = 8
+PAGE_QUEUE_SIZE = 4
+_END_OF_PROJECT = object()
+
+# Tiempos por etapa, latencia de cada página de search_all_resources y contadores; se guardan junto al inventario
+metrics = RunMetrics("inventory")
+
+# Las librerías de Google se importan al crear cada cliente: --help y --offline no las cargan
+def asset_client():
+    from google.cloud import asset_v1
+    return asset_v1.AssetServiceClient()
+
+def projects_client():
+    from google.cloud import resourcemanager_v3
+    return resourcemanager_v3.ProjectsClient()
+
+def resolve_project_numbers(projects_data, workers=INVENTORY_WORKERS, known=None):
+    """Mapea 'projects/NÚMERO' -> (nombre amigable, ID) para los proyectos del txt.
+    search_all_resources identifica el proyecto de cada recurso por número, no por ID.
+    Las consultas van en paralelo (hasta `workers` a la vez) y los números ya conocidos (`known`: ID -> número,
+    p. ej. los guardados en el snapshot) no se vuelven a pedir: el número de un proyecto no cambia."""
+    known = known or {}
+    missing = [p_id for _, p_id in projects_data if p_id not in known]
+    client = projects_client() if missing else None
+
+    def resolve(p_id):
+        try:
+            with metrics.call("projects.get_project"):
+                return client.get_project(name=f"projects/{p_id}").name
+        except Exception as e:
+            print(f"⚠️ No se pudo resolver el número de {p_id}: {e}")
+            return None
+
+    numbers = dict(known)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        numbers.update(zip(missing, executor.map(resolve, missing)))
+    return {numbers[p_id]: (p_name, p_id) for p_name, p_id in projects_data if numbers[p_id]}
+
+def write_scope_sweep(writer, client, scope, asset_types, projects_data, columns=DEFAULT_COLUMNS,
+                      workers=INVENTORY_WORKERS):
+    """Un solo barrido sobre una organización o carpeta, repartido por proyecto en el cliente.
+    Solo se escriben los recursos de los proyectos listados en el txt."""
+    by_number = resolve_project_numbers(projects_data, workers)
+    print(f"🔍 Auditando {len(by_number)} proyectos en un solo barrido de {scope}...")
+
+    counts = Counter()
+    with metrics.call("assets.search_all_resources"):
+        response = client.search_all_resources(
+            request={
+                "scope": scope,
+                "asset_types": asset_types,
+                "page_size": 500,
+                "read_mask": read_mask_for(columns, "project"),
+            }
+        )
+    for asset in metrics.paged_results("assets.search_all_resources.page", response):
+        project = by_number.get(asset.project)
+        if project is None:
+            continue
+        # Nombre amigable del TXT seguido de las columnas pedidas
+        writer.writerow([project[0], *asset_values(asset, columns)])
+        counts[project[1]] += 1
+
+    for p_name, p_id in projects_data:
+        print(f"   {p_name} ({p_id}): {counts[p_id]} recursos")
+    return sum(counts.values())
+
+def search_fields(client, scope, asset_types, fields, since=None):
+    """Recursos del alcance con solo `fields`, cronometrando cada página"""
+    request = {
+        "scope": scope,
+        "asset_types": asset_types,
+        "page_size": 500,
+        "read_mask": {"paths": fields},
+    }
+    if since is not None:
+        request["query"] = f"updateTime>{since}"
+    with metrics.call("assets.search_all_resources"):
+        response = client.search_all_resources(request=request)
+    return metrics.paged_results("assets.search_all_resources.page", response)
+
+def snapshot_entries(response, project_of):
+    """Convierte los recursos de los proyectos listados en pares (name, entrada del snapshot)"""
+    entries = []
+    for asset in response:
+        project_id = project_of(asset)
+        if project_id:
+            entry = dict(zip(INVENTORY_COLUMNS, asset_values(asset, INVENTORY_COLUMNS)))
+            entry["project_id"] = project_id
+            entries.append((asset.name, entry))
+    return entries
+
+def sync_snapshot(client, snapshot, asset_types, projects_data, scope=None, workers=INVENTORY_WORKERS):
+    """
+    Actualiza el snapshot pidiendo solo lo que cambió desde la última ejecución:
+    un listado de nombres (para detectar borrados) y el detalle de los recursos con updateTime posterior.
+    Los proyectos que aún no están en el snapshot se descargan completos.
+    """
+    started = time.time()
+    since = snapshot.changed_since()
+    known_projects = snapshot.project_ids()
+
+    if scope:
+        by_number = resolve_project_numbers(projects_data, workers, snapshot.project_numbers)
+        snapshot.project_numbers.update((p_id, number) for number, (_, p_id) in by_number.items())
+        sweeps = [(
+            scope,
+            lambda asset: by_number.get(asset.project, (None, None))[1],
+            {p_id for _, p_id in by_number.values()},
+        )]
+    else:
+        sweeps = [
+            (f"projects/{p_id}", lambda asset, p_id=p_id: p_id, {p_id})
+            for _, p_id in projects_data
+        ]
+
+    changes = []
+    failed = False
+    for sweep_scope, project_of, project_ids in sweeps:
+        print(f"🔍 Sincronizando: {sweep_scope}...")
+        sweep_since = since if project_ids <= known_projects else None
+        try:
+            live_names = {
+                asset.name
+                for asset in search_fields(client, sweep_scope, asset_types, LIVE_FIELDS)
+                if project_of(asset)
+            }
+            changed = snapshot_entries(
+                search_fields(client, sweep_scope, asset_types, SNAPSHOT_FIELDS, sweep_since), project_of
+            )
+            # Recursos vivos que no están en el snapshot ni llegaron como cambio: se descarga el alcance completo
+            changed_names = {name for name, _ in changed}
+            if sweep_since is not None and any(
+                name not in snapshot.assets and name not in changed_names for name in live_names
+            ):
+                changed = snapshot_entries(
+                    search_fields(client, sweep_scope, asset_types, SNAPSHOT_FIELDS), project_of
+                )
+            changes += snapshot.apply(project_ids, live_names, changed)
+        except Exception as e:
+            failed = True
+            print(f"⚠️ Error en {sweep_scope}: {e}")
+
+    # Si algún alcance falló no se avanza la marca de tiempo: la próxima ejecución vuelve a pedir sus cambios
+    if not failed:
+        snapshot.taken_at = started
+    snapshot.save()
+    return changes
+
+def export_inventory_delta(client, projects_data, asset_types, snapshot_path, timestamp, scope=None,
+                           diff=False, columns=DEFAULT_COLUMNS, output_format="csv", offline=False,
+                           workers=INVENTORY_WORKERS):
+    snapshot = InventorySnapshot(snapshot_path)
+    if snapshot.outdated:
+        print(f"⚠️ El snapshot {snapshot_path} tiene un formato anterior: se descarta y se sincroniza completo")
+    if offline:
+        # Sin conexión: el inventario se materializa tal como quedó en la última sincronización
+        if snapshot.taken_at is None:
+            print(f"⚠️ No hay snapshot en {snapshot_path}: el inventario saldrá vacío")
+        changes = []
+    else:
+        changes = sync_snapshot(client, snapshot, asset_types, projects_data, scope, workers)
+    names = {p_id: p_name for p_name, p_id in projects_data}
+
+    if diff:
+        writer, filename = open_inventory_writer(
+            f"{timestamp}_inventory_diff", output_format, ["CHANGE", "PROJECT_NAME", *columns]
+        )
+        try:
+            for change, _, entry in changes:
+                writer.writerow([
+                    change,
+                    names.get(entry["project_id"], entry["project_id"]),
+                    *(entry.get(column, "") for column in columns)
+                ])
+        finally:
+            writer.close()
+        metrics.add("rows_written", len(changes))
+        print(f"✅ Éxito: Se exportaron {len(changes)} cambios a '{filename}'")
+        return filename
+
+    # Inventario completo materializado desde el snapshot, en el orden de projects.txt
+    by_project = {p_id: [] for _, p_id in projects_data}
+    for entry in snapshot.assets.values():
+        if entry["project_id"] in by_project:
+            by_project[entry["project_id"]].append(entry)
+
+    total_count = 0
+    writer, filename = open_inventory_writer(f"{timestamp}_inventory", output_format, ["PROJECT_NAME", *columns])
     try:
-        with open(filename, "r") as f:
-            for line in f:
-                line = line.strip()
-                # Ignoramos comentarios y líneas vacías o sin el separador
-                if line and not line.startswith("#") and separator in line:
-                    parts = line.split(separator)
-                    if len(parts) >= 2:
-                        name = parts[0].strip()
-                        p_id = parts[1].strip()
-                        projects.append((name, p_id))
-        return projects
-    except FileNotFoundError:
-        print(f"⚠️ Archivo {filename} no encontrado.")
-        return []
-
-def load_asset_types(filename="assets.txt"):
-    """Lee los tipos de activos desde assets.txt"""
-    asset_types = []
+        for p_name, p_id in projects_data:
+            for entry in by_project[p_id]:
+                writer.writerow([p_name, *(entry.get(column, "") for column in columns)])
+                total_count += 1
+    finally:
+        writer.close()
+    metrics.add("rows_written", total_count)
+    print(f"✅ Éxito: Se exportaron {total_count} recursos ({len(changes)} cambios) a '{filename}'")
+    return filename
+
+def put_until_stopped(pages, item, stop):
+    """Encola esperando espacio, salvo que el escritor haya abortado"""
+    while not stop.is_set():
+        try:
+            pages.put(item, timeout=1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def fetch_project_pages(client, p_id, asset_types, pages, stop, columns=DEFAULT_COLUMNS,
+                        type_counts=None, write_types=None):
+    """Productor: pagina un proyecto y deja cada página (lista de filas) en su cola acotada.
+    Con `type_counts` (un Counter) se cuentan todos los recursos por tipo de activo en la misma pasada,
+    y con `write_types` solo se encolan las filas de esos tipos.
+    Retorna (recursos, segundos, error) para el reporte del proyecto."""
+    started = time.monotonic()
+    count = 0
+    error = None
+    extra_fields = ["asset_type"] if type_counts is not None or write_types is not None else []
     try:
-        with open(filename, "r") as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith("#"):
-                    asset_types.append(line)
-        return asset_types
-    except FileNotFoundError:
-        return ["compute.googleapis.com/Instance", "storage.googleapis.com/Bucket"]
-
-def export_inventory_to_csv():
-    client = asset_v1.AssetServiceClient()
+        with metrics.call("assets.search_all_resources"):
+            response = client.search_all_resources(
+                request={
+                    "scope": f"projects/{p_id}",
+                    "asset_types": asset_types,
+                    "page_size": 500,
+                    "read_mask": read_mask_for(columns, *extra_fields),
+                }
+            )
+        for page in metrics.timed_pages("assets.search_all_resources.page", response.pages):
+            assets = page.results
+            if type_counts is not None:
+                type_counts.update(asset.asset_type for asset in assets)
+            if write_types is not None:
+                assets = [asset for asset in assets if asset.asset_type in write_types]
+            rows = [asset_values(asset, columns) for asset in assets]
+            if not put_until_stopped(pages, rows, stop):
+                break
+            count += len(rows)
+    except Exception as e:
+        error = e
+    finally:
+        put_until_stopped(pages, _END_OF_PROJECT, stop)
+    return count, time.monotonic() - started, error
+
+def write_projects_parallel(writer, client, asset_types, projects_data, workers=INVENTORY_WORKERS,
+                            columns=DEFAULT_COLUMNS, type_counts=None, write_types=None):
+    """
+    Varios proyectos se paginan en paralelo y un único escritor vacía sus colas en el orden de projects.txt.
+    Cada cola guarda como máximo PAGE_QUEUE_SIZE páginas, así la memoria no crece con el inventario.
+    `type_counts` (un Counter por proyecto) y `write_types` se pasan a fetch_project_pages.
+    Retorna (recursos, segundos, error) de cada proyecto, en el orden de projects.txt.
+    """
+    results = []
+    page_queues = [queue.Queue(maxsize=PAGE_QUEUE_SIZE) for _ in projects_data]
+    counters = type_counts if type_counts is not None else [None] * len(projects_data)
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [
+            executor.submit(fetch_project_pages, client, p_id, asset_types, pages, stop, columns, counts, write_types)
+            for (_, p_id), pages, counts in zip(projects_data, page_queues, counters)
+        ]
+        try:
+            results = drain_project_pages(writer, projects_data, page_queues, futures)
+        finally:
+            # Si el escritor falla, los productores bloqueados en colas llenas se liberan
+            stop.set()
+            for future in futures:
+                future.cancel()
+    return results
+
+def drain_project_pages(writer, projects_data, page_queues, futures):
+    """Escritor único: vacía las colas de cada proyecto en orden y reporta su resultado"""
+    results = []
+    for (p_name, p_id), pages, future in zip(projects_data, page_queues, futures):
+        print(f"🔍 Auditando: {p_name} ({p_id})...")
+        while True:
+            rows = pages.get()
+            if rows is _END_OF_PROJECT:
+                break
+            for values in rows:
+                # Coloca el nombre amigable del TXT seguido de las columnas pedidas
+                writer.writerow([p_name, *values])
+        count, elapsed, error = future.result()
+        results.append((count, elapsed, error))
+        if error is not None:
+            print(f"⚠️ Error en {p_id} tras {elapsed:.1f}s ({count} recursos exportados): {error}")
+        else:
+            print(f"   {count} recursos en {elapsed:.1f}s")
+    return results
+
+def write_run_metrics(filename):
+    """Guarda las métricas de la ejecución junto al archivo exportado"""
+    metrics.add("bytes_written", file_size(filename))
+    metrics.set_info(report=filename)
+    metrics.write(filename)
+
+def export_inventory_to_csv(scope=None, snapshot_path=None, diff=False, workers=INVENTORY_WORKERS,
+                            columns=DEFAULT_COLUMNS, output_format="csv", offline=False):
+    """Exporta el inventario de los proyectos del txt.
+    Con `scope` ("organizations/ID" o "folders/ID") se hace un único barrido en lugar de uno por proyecto.
+    Con `snapshot_path` solo se descargan los cambios desde la ejecución anterior; con `offline` además
+    no se consulta la API (ni se carga su librería): el inventario sale del snapshot guardado.
+    `columns` define las columnas (y el read_mask pedido a la API) y `output_format` el formato del archivo."""
+    unknown = [column for column in columns if column not in INVENTORY_COLUMNS]
+    if unknown:
+        print(f"❌ Error: columnas desconocidas {unknown} (usa: {', '.join(INVENTORY_COLUMNS)}).")
+        return
+    if offline and (not snapshot_path or diff):
+        print("❌ Error: --offline requiere --snapshot y no admite --diff (los cambios salen de la API).")
+        return
+
+    metrics.reset()
     
     # Cargamos configuraciones
-    projects_data = load_projects()
-    asset_types = load_asset_types()
+    with metrics.stage("load_config"):
+        projects_data = load_projects()
+        asset_types = load_asset_types()
 
     if not projects_data:
         print("❌ Error: projects.txt está vacío o mal formateado (usa: Nombre,ID).")
         return
 
-    # Nombre de archivo solicitado: YYYYMMDD_HHMM_inventory.csv
+    client = None if offline else asset_client()
+
+    # Nombre de archivo solicitado: YYYYMMDD_HHMM_inventory.<formato>
     timestamp = datetime.now().strftime("%Y%m%d_%H%M")
-    filename = f"{timestamp}_inventory.csv"
 
-    try:
-        with open(filename, mode='w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            # Encabezados limpios
-            writer.writerow(["PROJECT_NAME", "RESOURCE_NAME", "SERVICE"])
+    metrics.set_info(projects=len(projects_data), asset_types=len(asset_types), workers=workers,
+                     scope=scope, snapshot=bool(snapshot_path), output_format=output_format, offline=offline)
+
+    if snapshot_path:
+        try:
+            with metrics.stage("snapshot_export"):
+                filename = export_inventory_delta(
+                    client, projects_data, asset_types, snapshot_path, timestamp, scope, diff, columns, output_format,
+                    offline, workers,
+                )
+            write_run_metrics(filename)
+        except Exception as e:
+            print(f"❌ Error al crear el archivo: {e}")
+        return
 
+    try:
+        # Encabezados limpios
+        writer, filename = open_inventory_writer(f"{timestamp}_inventory", output_format, ["PROJECT_NAME", *columns])
+        try:
             total_count = 0
-            for p_name, p_id in projects_data:
-                print(f"🔍 Auditando: {p_name} ({p_id})...")
-                scope = f"projects/{p_id}"
-                
-                try:
-                    response = client.search_all_resources(
-                        request={"scope": scope, "asset_types": asset_types}
-                    )
-
-                    for asset in response:
-                        writer.writerow([
-                            p_name,              # Coloca el nombre amigable del TXT
-                            asset.display_name,  # Nombre del recurso
-                            asset.asset_type     # Tipo de servicio
-                        ])
-                        total_count += 1
-                except Exception as e:
-                    print(f"⚠️ Error en {p_id}: {e}")
+            with metrics.stage("export"):
+                if scope:
+                    try:
+                        total_count = write_scope_sweep(writer, client, scope, asset_types, projects_data, columns, workers)
+                    except Exception as e:
+                        print(f"⚠️ Error en {scope}: {e}")
+                else:
+                    results = write_projects_parallel(writer, client, asset_types, projects_data, workers, columns)
+                    total_count = sum(count for count, _, _ in results)
+        finally:
+            writer.close()
 
+        metrics.add("rows_written", total_count)
+        write_run_metrics(filename)
         print(f"✅ Éxito: Se exportaron {total_count} recursos a '{filename}'")
         
     except Exception as e:
         print(f"❌ Error al crear el archivo: {e}")
 
 if __name__ == "__main__":
-    export_inventory_to_csv()
\ No newline at end of file
+    parser = argparse.ArgumentParser(
+        description="Exporta el inventario de recursos de los proyectos de projects.txt"
+    )
+    parser.add_argument(
+        "--scope",
+        type=str,
+        default=None,
+        help="Organización o carpeta a barrer de una sola vez (ej: organizations/123, folders/456). "
+             "Por defecto se consulta proyecto por proyecto",
+    )
+    parser.add_argument(
+        "--snapshot",
+        type=str,
+        default=None,
+        help="Archivo JSON con el snapshot local; activa el modo incremental (solo se descargan cambios)",
+    )
+    parser.add_argument(
+        "--diff",
+        action="store_true",
+        help="Con --snapshot, escribe solo los recursos agregados/eliminados/modificados",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Con --snapshot, exporta el inventario guardado sin consultar ni cargar la API de Google",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=INVENTORY_WORKERS,
+        help=f"Proyectos paginados en paralelo (default: {INVENTORY_WORKERS})",
+    )
+    parser.add_argument(
+        "--columns",
+        type=str,
+        default=",".join(DEFAULT_COLUMNS),
+        help=f"Columnas a exportar separadas por coma, de: {', '.join(INVENTORY_COLUMNS)} "
+             f"(default: {','.join(DEFAULT_COLUMNS)})",
+    )
+    parser.add_argument(
+        "--format",
+        type=str,
+        choices=list(WRITERS),
+        default="csv",
+        help="Formato del archivo de salida (default: csv)",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        default=None,
+        help="Ejecuta bajo cProfile y guarda las estadísticas en este archivo (.prof)",
+    )
+
+    args = parser.parse_args()
+    run_profiled(
+        args.profile,
+        export_inventory_to_csv,
+        scope=args.scope,
+        snapshot_path=args.snapshot,
+        diff=args.diff,
+        workers=args.workers,
+        columns=[column.strip() for column in args.columns.split(",") if column.strip()],
+        output_format=args.format,
+        offline=args.offline,
+    )
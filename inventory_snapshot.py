@@ -0,0 +1,102 @@
+import os
+import json
+
+# Margen al consultar cambios desde el último snapshot (cubre relojes desfasados y escrituras en curso)
+SNAPSHOT_MARGIN = 300  # segundos
+
+# Versión del formato del snapshot: si cambian las entradas, los snapshots viejos se descartan (resincronización completa)
+SNAPSHOT_VERSION = 2
+
+ADDED = "ADDED"
+REMOVED = "REMOVED"
+CHANGED = "CHANGED"
+
+
+class InventorySnapshot:
+    """
+    Estado local del inventario, indexado por el nombre completo del recurso.
+    Cada entrada guarda el proyecto y los valores de las columnas del inventario,
+    suficiente para materializar el CSV completo o calcular un diff sin volver a descargar todo.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.taken_at = None  # epoch del inicio de la última ejecución
+        self.assets = {}      # name -> {"project_id", COLUMNA: valor, ...}
+        self.projects = set()  # proyectos ya sincronizados, incluso los que no tienen recursos
+        self.project_numbers = {}  # project_id -> "projects/NÚMERO", para no volver a resolverlos en cada barrido
+        self.by_project = {}  # project_id -> {name: None}: índice para calcular borrados sin recorrer todo el snapshot
+        self.outdated = False  # había un snapshot con otro formato y se descartó
+        self.load()
+
+    def load(self):
+        self.taken_at = None
+        self.assets = {}
+        self.projects = set()
+        self.project_numbers = {}
+        self.by_project = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        if data.get("version") != SNAPSHOT_VERSION:
+            self.outdated = True
+            return
+        self.taken_at = data.get("taken_at")
+        self.assets = data.get("assets", {})
+        self.projects = set(data.get("projects", []))
+        self.project_numbers = data.get("project_numbers", {})
+        for name, entry in self.assets.items():
+            self.by_project.setdefault(entry["project_id"], {})[name] = None
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": SNAPSHOT_VERSION,
+                "taken_at": self.taken_at,
+                "projects": sorted(self.projects),
+                "project_numbers": self.project_numbers,
+                "assets": self.assets,
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def changed_since(self):
+        """Epoch a partir del cual pedir cambios, o None si no hay snapshot previo"""
+        if self.taken_at is None:
+            return None
+        return int(self.taken_at - SNAPSHOT_MARGIN)
+
+    def project_ids(self):
+        return self.projects | {project_id for project_id, names in self.by_project.items() if names}
+
+    def apply(self, project_ids, live_names, changed_entries):
+        """
+        Aplica a los proyectos `project_ids` el resultado de un barrido incremental:
+        - live_names: nombres de todos los recursos que existen hoy en esos proyectos
+        - changed_entries: lista de (name, entrada) modificados desde el último snapshot
+        Retorna la lista de cambios [(tipo, name, entrada)].
+        """
+        changes = []
+        # Solo se revisan los recursos de los proyectos barridos (en el orden del índice, que es estable)
+        for project_id, names in self.by_project.items():
+            if project_id not in project_ids:
+                continue
+            for name in [name for name in names if name not in live_names]:
+                del names[name]
+                changes.append((REMOVED, name, self.assets.pop(name)))
+
+        for name, entry in changed_entries:
+            previous = self.assets.get(name)
+            if previous is None:
+                changes.append((ADDED, name, entry))
+            elif previous != entry:
+                changes.append((CHANGED, name, entry))
+                if previous["project_id"] != entry["project_id"]:
+                    self.by_project[previous["project_id"]].pop(name, None)
+            self.assets[name] = entry
+            self.by_project.setdefault(entry["project_id"], {})[name] = None
+        self.projects.update(project_ids)
+        return changes
@@ -0,0 +1,92 @@
+import csv
+import gzip
+import json
+
+# Filas por row group en Parquet (también es el máximo de filas en memoria)
+PARQUET_ROW_GROUP_SIZE = 50_000
+
+
+def _open_text(filename):
+    if filename.endswith(".gz"):
+        return gzip.open(filename, "wt", newline="", encoding="utf-8")
+    return open(filename, "w", newline="", encoding="utf-8")
+
+
+class CsvInventoryWriter:
+    def __init__(self, filename, header):
+        self.file = _open_text(filename)
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(header)
+
+    def writerow(self, row):
+        self.writer.writerow(row)
+
+    def close(self):
+        self.file.close()
+
+
+class JsonlInventoryWriter:
+    def __init__(self, filename, header):
+        self.file = _open_text(filename)
+        self.header = header
+
+    def writerow(self, row):
+        self.file.write(json.dumps(dict(zip(self.header, row)), ensure_ascii=False))
+        self.file.write("\n")
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetInventoryWriter:
+    """Escribe Parquet por row groups: nunca hay más de PARQUET_ROW_GROUP_SIZE filas en memoria"""
+
+    def __init__(self, filename, header):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("El formato parquet requiere pyarrow (pip install pyarrow)")
+        self.pa = pa
+        self.header = header
+        self.schema = pa.schema([(name, pa.string()) for name in header])
+        self.writer = pq.ParquetWriter(filename, self.schema, compression="snappy")
+        self.columns = [[] for _ in header]
+
+    def writerow(self, row):
+        for column, value in zip(self.columns, row):
+            column.append(None if value is None else str(value))
+        if len(self.columns[0]) >= PARQUET_ROW_GROUP_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self.columns[0]:
+            return
+        table = self.pa.Table.from_arrays(
+            [self.pa.array(column, type=self.pa.string()) for column in self.columns],
+            schema=self.schema,
+        )
+        self.writer.write_table(table)
+        self.columns = [[] for _ in self.header]
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+# Formatos de salida soportados (el formato es también la extensión del archivo)
+WRITERS = {
+    "csv": CsvInventoryWriter,
+    "csv.gz": CsvInventoryWriter,
+    "jsonl": JsonlInventoryWriter,
+    "jsonl.gz": JsonlInventoryWriter,
+    "parquet": ParquetInventoryWriter,
+}
+
+
+def open_inventory_writer(basename, output_format, header):
+    """Crea el escritor del formato pedido; retorna (writer, nombre de archivo)"""
+    if output_format not in WRITERS:
+        raise ValueError(f"Formato no soportado: {output_format} (usa: {', '.join(WRITERS)})")
+    filename = f"{basename}.{output_format}"
+    return WRITERS[output_format](filename, header), filename
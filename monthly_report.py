@@ -0,0 +1,211 @@
+"""
+Ejecución mensual combinada: inventario (inventory.py) y reporte de facturación (billing_report.py)
+con una sola descarga de recursos.
+
+Cada proyecto se pagina una sola vez con search_all_resources: las páginas alimentan al escritor del
+inventario (solo los tipos de assets.txt) y, en la misma pasada, al conteo de recursos por tipo que usa
+el reporte de facturación (todos los tipos, igual que get_total_resources). projects.txt se lee una vez.
+"""
+import os
+import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import billing_report
+import inventory
+from inventory_writers import WRITERS, open_inventory_writer
+from projects_config import load_asset_types, load_projects
+from run_metrics import run_profiled
+
+BILLING_OUTPUT_DIR = "./Reports/Billing"
+
+
+def generate_monthly_reports(workers=inventory.INVENTORY_WORKERS, billing_workers=billing_report.MAX_WORKERS,
+                             columns=inventory.DEFAULT_COLUMNS, output_format="csv", rate_limits=None,
+                             billing_cache_path=None, billing_cache_ttl=billing_report.BILLING_CACHE_TTL,
+                             resource_breakdown=False, run_deadline=None,
+                             max_bytes_billed=billing_report.MAX_BYTES_BILLED,
+                             months_count=billing_report.DEFAULT_COST_MONTHS, end_month=None,
+                             cost_store_path=None, cost_store_ttl=billing_report.CURRENT_MONTH_TTL):
+    unknown = [column for column in columns if column not in inventory.INVENTORY_COLUMNS]
+    if unknown:
+        print(f"❌ Error: columnas desconocidas {unknown} (usa: {', '.join(inventory.INVENTORY_COLUMNS)}).")
+        return
+
+    projects_data = load_projects()
+    asset_types = load_asset_types()
+    if not projects_data:
+        print("❌ Error: projects.txt está vacío o mal formateado (usa: Nombre,ID).")
+        return
+
+    inventory.metrics.reset()
+    billing_report.metrics.reset()
+    billing_report.call_policy.reset(run_deadline=run_deadline)
+    billing_accounts = billing_report.billing_accounts
+    if billing_cache_path:
+        billing_accounts.path = billing_cache_path
+        billing_accounts.load()
+    billing_accounts.ttl = billing_cache_ttl
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M")
+    months = billing_report.cost_months(months_count, end_month)
+    os.makedirs(BILLING_OUTPUT_DIR, exist_ok=True)
+    billing_filename = f"{BILLING_OUTPUT_DIR}/reporte_multicuenta_{timestamp}.csv"
+
+    print(f"🔍 Barrido único de {len(projects_data)} proyectos para inventario y conteo de recursos...")
+    with ThreadPoolExecutor(max_workers=1) as costs_executor:
+        # La consulta de costos corre en BigQuery mientras se paginan los recursos
+        costs_future = costs_executor.submit(
+            billing_report.fetch_all_costs, projects_data, months, cost_store_path, cost_store_ttl, max_bytes_billed
+        )
+
+        # Un Counter por proyecto: se llena con todos los tipos mientras se escriben solo los de assets.txt
+        type_counts = [Counter() for _ in projects_data]
+        client = billing_report.get_client("assets")
+        writer, inventory_filename = open_inventory_writer(
+            f"{timestamp}_inventory", output_format, ["PROJECT_NAME", *columns]
+        )
+        try:
+            with inventory.metrics.stage("export"):
+                results = inventory.write_projects_parallel(
+                    writer, client, [], projects_data, workers, columns, type_counts, set(asset_types)
+                )
+        finally:
+            writer.close()
+
+        total_count = sum(count for count, _, _ in results)
+        inventory.metrics.add("rows_written", total_count)
+        inventory.metrics.set_info(projects=len(projects_data), asset_types=len(asset_types), workers=workers,
+                                   output_format=output_format, combined=True)
+        inventory.write_run_metrics(inventory_filename)
+        print(f"✅ Inventario: {total_count} recursos en '{inventory_filename}'")
+
+        all_costs, costs_status = costs_future.result()
+
+    # El conteo de recursos sale del barrido anterior; solo se consultan facturación y fecha de creación
+    resources = [(counts, error) for counts, (_, _, error) in zip(type_counts, results)]
+    print(f"🚀 Generando reporte consolidado en {billing_filename}...")
+    try:
+        billing_report.write_billing_report(
+            billing_filename,
+            projects_data,
+            billing_report.build_limiters(rate_limits),
+            months,
+            all_costs,
+            costs_status,
+            resource_breakdown,
+            billing_workers,
+            resources,
+        )
+        billing_accounts.save()
+        billing_report.write_run_metrics(billing_filename, len(projects_data), billing_workers)
+        print(f"✅ Reporte de facturación finalizado: '{billing_filename}'")
+    except Exception as e:
+        print(f"❌ Error crítico: {e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Genera el inventario y el reporte de facturación con un solo barrido de recursos"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=inventory.INVENTORY_WORKERS,
+        help=f"Proyectos paginados en paralelo (default: {inventory.INVENTORY_WORKERS})",
+    )
+    parser.add_argument(
+        "--billing-workers",
+        type=int,
+        default=billing_report.MAX_WORKERS,
+        help=f"Proyectos consultados en paralelo para facturación (default: {billing_report.MAX_WORKERS})",
+    )
+    parser.add_argument(
+        "--columns",
+        type=str,
+        default=",".join(inventory.DEFAULT_COLUMNS),
+        help=f"Columnas del inventario separadas por coma, de: {', '.join(inventory.INVENTORY_COLUMNS)} "
+             f"(default: {','.join(inventory.DEFAULT_COLUMNS)})",
+    )
+    parser.add_argument(
+        "--format",
+        type=str,
+        choices=list(WRITERS),
+        default="csv",
+        help="Formato del archivo de inventario (default: csv)",
+    )
+    for api in ("billing", "projects"):
+        rate = billing_report.API_RATE_LIMITS[api]
+        parser.add_argument(
+            f"--{api}-qps",
+            type=float,
+            default=rate,
+            help=f"Máximo de llamadas por segundo a la API de {api}, 0 = sin límite (default: {rate})",
+        )
+    parser.add_argument(
+        "--billing-cache",
+        type=str,
+        default=None,
+        help="Archivo JSON donde persistir los nombres de cuentas de facturación entre ejecuciones",
+    )
+    parser.add_argument(
+        "--resource-breakdown",
+        action="store_true",
+        help="Agrega la columna RESOURCES_BY_TYPE al reporte de facturación",
+    )
+    parser.add_argument(
+        "--months",
+        type=int,
+        default=billing_report.DEFAULT_COST_MONTHS,
+        help=f"Meses de costo en el reporte, del más reciente hacia atrás (default: {billing_report.DEFAULT_COST_MONTHS})",
+    )
+    parser.add_argument(
+        "--end-month",
+        type=billing_report.billing_month,
+        default=None,
+        help="Último mes de factura del reporte, YYYYMM (default: el mes en curso)",
+    )
+    parser.add_argument(
+        "--cost-store",
+        type=str,
+        default=None,
+        help="Base SQLite donde guardar los costos mensuales; los meses cerrados no se vuelven a consultar",
+    )
+    parser.add_argument(
+        "--max-bytes-billed",
+        type=int,
+        default=billing_report.MAX_BYTES_BILLED,
+        help=f"Tope de bytes facturados por la consulta de costos, 0 = sin tope "
+             f"(default: {billing_report.MAX_BYTES_BILLED})",
+    )
+    parser.add_argument(
+        "--run-deadline",
+        type=float,
+        default=None,
+        help="Segundos máximos para las consultas de facturación; al agotarse quedan marcadas en STATUS",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        default=None,
+        help="Ejecuta bajo cProfile y guarda las estadísticas en este archivo (.prof)",
+    )
+
+    args = parser.parse_args()
+    run_profiled(
+        args.profile,
+        generate_monthly_reports,
+        workers=args.workers,
+        billing_workers=args.billing_workers,
+        columns=[column.strip() for column in args.columns.split(",") if column.strip()],
+        output_format=args.format,
+        rate_limits={api: getattr(args, f"{api}_qps") for api in ("billing", "projects")},
+        billing_cache_path=args.billing_cache,
+        resource_breakdown=args.resource_breakdown,
+        run_deadline=args.run_deadline,
+        max_bytes_billed=args.max_bytes_billed,
+        months_count=args.months,
+        end_month=args.end_month,
+        cost_store_path=args.cost_store,
+    )
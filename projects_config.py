@@ -0,0 +1,38 @@
+"""
+Archivos de configuración compartidos por inventory.py, billing_report.py y monthly_report.py:
+projects.txt (Nombre,ID por línea) y assets.txt (un tipo de activo por línea).
+"""
+
+
+def load_projects(filename="projects.txt", separator=","):
+    """Carga pares de (Nombre, ID) desde el archivo txt"""
+    projects = []
+    try:
+        with open(filename, "r") as f:
+            for line in f:
+                line = line.strip()
+                # Ignoramos comentarios y líneas vacías o sin el separador
+                if line and not line.startswith("#") and separator in line:
+                    parts = line.split(separator)
+                    if len(parts) >= 2:
+                        name = parts[0].strip()
+                        p_id = parts[1].strip()
+                        projects.append((name, p_id))
+        return projects
+    except FileNotFoundError:
+        print(f"⚠️ Archivo {filename} no encontrado.")
+        return []
+
+
+def load_asset_types(filename="assets.txt"):
+    """Lee los tipos de activos desde assets.txt"""
+    asset_types = []
+    try:
+        with open(filename, "r") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    asset_types.append(line)
+        return asset_types
+    except FileNotFoundError:
+        return ["compute.googleapis.com/Instance", "storage.googleapis.com/Bucket"]
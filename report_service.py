@@ -0,0 +1,320 @@
+"""
+Servicio local de reportes: HTTP/JSON en localhost que mantiene vivos los clientes de GCP entre pedidos.
+
+Los datos por proyecto (facturación, fecha de creación, conteo de recursos) quedan en la caché de resultados
+de billing_report.py con un TTL por campo y expulsión LRU, y los costos mensuales en un CostStore que se abre
+una vez para toda la vida del servicio. Un reporte repetido, o uno que se superpone con otro en curso, sale de
+la caché sin volver a consultar las APIs; el inventario completo se cachea como un solo resultado.
+
+Rutas:
+  GET  /billing?months=3&end_month=YYYYMM&resource_breakdown=1  -> CSV del reporte de facturación
+       con no_costs=1 / no_resources=1 no se consultan costos / recursos y se omiten sus columnas
+  GET  /inventory?columns=RESOURCE_NAME,SERVICE                   -> CSV del inventario
+  GET  /stats                                                     -> JSON con la caché y las métricas acumuladas
+  POST /invalidate?field=billing                                  -> vacía la caché (o solo un campo)
+"""
+import io
+import csv
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import billing_report
+import inventory
+from cost_store import CostStore
+from projects_config import load_asset_types, load_projects
+from result_cache import DEFAULT_MAX_ENTRIES
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Segundos de validez de cada campo cacheado; los costos usan el TTL del almacén (--cost-store-ttl)
+FIELD_TTLS = {**billing_report.PROJECT_CACHE_TTLS, "inventory": 900}
+
+
+class BadRequest(ValueError):
+    """Parámetros inválidos en el pedido: se responde 400"""
+
+
+def query_flag(params, name):
+    return params.get(name, [""])[0].lower() in ("1", "true", "yes", "si")
+
+
+class ReportService:
+    """Estado compartido por todos los pedidos: caché, almacén de costos, limitadores y clientes"""
+
+    def __init__(self, field_ttls=None, max_entries=DEFAULT_MAX_ENTRIES, workers=billing_report.MAX_WORKERS,
+                 inventory_workers=inventory.INVENTORY_WORKERS, rate_limits=None, cost_store_path=None,
+                 cost_store_ttl=billing_report.CURRENT_MONTH_TTL, billing_cache_path=None,
+                 max_bytes_billed=billing_report.MAX_BYTES_BILLED):
+        ttls = {**FIELD_TTLS, **(field_ttls or {})}
+        billing_report.project_cache.ttls = ttls
+        billing_report.project_cache.max_entries = max_entries
+        self.cache = billing_report.project_cache
+        self.workers = workers
+        self.inventory_workers = inventory_workers
+        self.max_bytes_billed = max_bytes_billed
+        # Un solo juego de limitadores: el QPS configurado vale para todos los pedidos simultáneos
+        self.limiters = billing_report.build_limiters(rate_limits)
+        self.cost_store = CostStore(cost_store_path, cost_store_ttl)
+        # Pedidos superpuestos: el segundo espera y encuentra en el almacén los costos que consultó el primero
+        self.costs_lock = threading.Lock()
+
+        billing_report.metrics.reset()
+        inventory.metrics.reset()
+        billing_report.call_policy.reset()
+        if billing_cache_path:
+            billing_report.billing_accounts.path = billing_cache_path
+            billing_report.billing_accounts.load()
+
+    def warm_up(self):
+        """Crea los clientes al arrancar (autenticación y canales) para que el primer pedido no los pague"""
+        for api in billing_report.CLIENT_FACTORIES:
+            billing_report.get_client(api)
+
+    def billing_csv(self, params):
+        try:
+            months_count = int(params.get("months", [billing_report.DEFAULT_COST_MONTHS])[0])
+        except ValueError:
+            raise BadRequest("months debe ser un número entero")
+        end_month = params.get("end_month", [None])[0]
+        if end_month is not None:
+            try:
+                end_month = billing_report.billing_month(end_month)
+            except argparse.ArgumentTypeError as e:
+                raise BadRequest(f"end_month: {e}")
+        resource_breakdown = query_flag(params, "resource_breakdown")
+        count_resources = not query_flag(params, "no_resources")
+
+        projects_list = load_projects()
+        if not projects_list:
+            raise BadRequest("projects.txt está vacío o mal formateado (usa: Nombre,ID)")
+        months, all_costs, costs_status = [], {}, None
+        if not query_flag(params, "no_costs"):
+            months = billing_report.cost_months(months_count, end_month)
+            with self.costs_lock:
+                all_costs, costs_status = billing_report.fetch_all_costs(
+                    projects_list, months, max_bytes_billed=self.max_bytes_billed, store=self.cost_store
+                )
+
+        buffer = io.StringIO()
+        billing_report.write_billing_csv(
+            buffer, projects_list, self.limiters, months, all_costs, costs_status, resource_breakdown, self.workers,
+            count_resources=count_resources,
+        )
+        billing_report.billing_accounts.save()
+        return buffer.getvalue()
+
+    def inventory_csv(self, params):
+        columns = [
+            column.strip()
+            for column in params.get("columns", [",".join(inventory.DEFAULT_COLUMNS)])[0].split(",")
+            if column.strip()
+        ]
+        unknown = [column for column in columns if column not in inventory.INVENTORY_COLUMNS]
+        if unknown:
+            raise BadRequest(f"columnas desconocidas {unknown} (usa: {', '.join(inventory.INVENTORY_COLUMNS)})")
+        return self.cache.get("inventory", tuple(columns), self.build_inventory_csv)
+
+    def build_inventory_csv(self, columns):
+        projects_data = load_projects()
+        asset_types = load_asset_types()
+        if not projects_data:
+            raise BadRequest("projects.txt está vacío o mal formateado (usa: Nombre,ID)")
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["PROJECT_NAME", *columns])
+        with inventory.metrics.stage("export"):
+            results = inventory.write_projects_parallel(
+                writer, billing_report.get_client("assets"), asset_types, projects_data,
+                self.inventory_workers, list(columns),
+            )
+        failed = [p_id for (_, p_id), (_, _, error) in zip(projects_data, results) if error is not None]
+        if failed:
+            # Un inventario incompleto no se cachea: el próximo pedido lo vuelve a intentar
+            raise RuntimeError(f"no se pudo paginar el inventario de {', '.join(failed)}")
+        inventory.metrics.add("rows_written", sum(count for count, _, _ in results))
+        return buffer.getvalue()
+
+    def invalidate(self, params):
+        field = params.get("field", [None])[0]
+        return {"invalidated": self.cache.invalidate(field), "field": field}
+
+    def stats(self):
+        return {
+            "cache": self.cache.stats(),
+            "billing_report": billing_report.metrics.to_dict(),
+            "inventory": inventory.metrics.to_dict(),
+        }
+
+
+class ReportRequestHandler(BaseHTTPRequestHandler):
+    service = None  # ReportService, asignado en serve()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        routes = {
+            "/billing": lambda: ("text/csv", self.service.billing_csv(params)),
+            "/inventory": lambda: ("text/csv", self.service.inventory_csv(params)),
+            "/stats": lambda: ("application/json", json.dumps(self.service.stats(), ensure_ascii=False)),
+        }
+        self.respond(routes.get(url.path))
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        routes = {
+            "/invalidate": lambda: ("application/json", json.dumps(self.service.invalidate(params))),
+        }
+        self.respond(routes.get(url.path))
+
+    def respond(self, route):
+        started = time.perf_counter()
+        if route is None:
+            status, content_type, body = 404, "application/json", json.dumps({"error": "ruta desconocida"})
+        else:
+            try:
+                content_type, body = route()
+                status = 200
+            except BadRequest as e:
+                status, content_type, body = 400, "application/json", json.dumps({"error": str(e)}, ensure_ascii=False)
+            except Exception as e:
+                print(f"❌ Error en {self.path}: {e}")
+                status, content_type, body = 500, "application/json", json.dumps({"error": str(e)}, ensure_ascii=False)
+
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("X-Elapsed-Seconds", f"{time.perf_counter() - started:.3f}")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        print(f"🌐 {self.address_string()} {format % args}")
+
+
+def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT, warm_up=True):
+    if warm_up:
+        print("🔌 Creando clientes de GCP...")
+        service.warm_up()
+    ReportRequestHandler.service = service
+    server = ThreadingHTTPServer((host, port), ReportRequestHandler)
+    print(f"✅ Servicio de reportes escuchando en http://{host}:{server.server_port} (Ctrl+C para terminar)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("🛑 Servicio detenido.")
+    finally:
+        server.server_close()
+        service.cost_store.close()
+        billing_report.billing_accounts.save()
+
+
+def parse_ttl(value):
+    """'billing=600' -> ('billing', 600.0)"""
+    field, sep, seconds = value.partition("=")
+    if not sep or field not in FIELD_TTLS:
+        raise argparse.ArgumentTypeError(f"usa CAMPO=SEGUNDOS con CAMPO en: {', '.join(FIELD_TTLS)}")
+    try:
+        return field, float(seconds)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"segundos inválidos: {seconds}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Servicio local que genera los reportes de facturación e inventario con clientes y caché en memoria"
+    )
+    parser.add_argument(
+        "--host",
+        type=str,
+        default=DEFAULT_HOST,
+        help=f"Dirección donde escuchar (default: {DEFAULT_HOST}, solo esta máquina)",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_PORT,
+        help=f"Puerto HTTP (default: {DEFAULT_PORT})",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=billing_report.MAX_WORKERS,
+        help=f"Proyectos consultados en paralelo por reporte de facturación (default: {billing_report.MAX_WORKERS})",
+    )
+    parser.add_argument(
+        "--inventory-workers",
+        type=int,
+        default=inventory.INVENTORY_WORKERS,
+        help=f"Proyectos paginados en paralelo por inventario (default: {inventory.INVENTORY_WORKERS})",
+    )
+    for api, rate in billing_report.API_RATE_LIMITS.items():
+        parser.add_argument(
+            f"--{api}-qps",
+            type=float,
+            default=rate,
+            help=f"Máximo de llamadas por segundo a la API de {api}, 0 = sin límite (default: {rate})",
+        )
+    parser.add_argument(
+        "--ttl",
+        type=parse_ttl,
+        action="append",
+        default=[],
+        help="TTL de un campo cacheado, CAMPO=SEGUNDOS; se puede repetir "
+             f"(default: {', '.join(f'{k}={v}' for k, v in FIELD_TTLS.items())})",
+    )
+    parser.add_argument(
+        "--max-entries",
+        type=int,
+        default=DEFAULT_MAX_ENTRIES,
+        help=f"Entradas máximas en la caché; las menos usadas se descartan primero (default: {DEFAULT_MAX_ENTRIES})",
+    )
+    parser.add_argument(
+        "--cost-store",
+        type=str,
+        default=None,
+        help="Base SQLite de costos mensuales; sin ella los costos se guardan en memoria mientras corre el servicio",
+    )
+    parser.add_argument(
+        "--cost-store-ttl",
+        type=int,
+        default=billing_report.CURRENT_MONTH_TTL,
+        help=f"Segundos de validez del costo de un mes aún abierto (default: {billing_report.CURRENT_MONTH_TTL})",
+    )
+    parser.add_argument(
+        "--billing-cache",
+        type=str,
+        default=None,
+        help="Archivo JSON donde persistir los nombres de cuentas de facturación entre reinicios",
+    )
+    parser.add_argument(
+        "--max-bytes-billed",
+        type=int,
+        default=billing_report.MAX_BYTES_BILLED,
+        help=f"Tope de bytes facturados por cada consulta de costos, 0 = sin tope "
+             f"(default: {billing_report.MAX_BYTES_BILLED})",
+    )
+
+    args = parser.parse_args()
+    serve(
+        ReportService(
+            field_ttls=dict(args.ttl),
+            max_entries=args.max_entries,
+            workers=args.workers,
+            inventory_workers=args.inventory_workers,
+            rate_limits={api: getattr(args, f"{api}_qps") for api in billing_report.API_RATE_LIMITS},
+            cost_store_path=args.cost_store,
+            cost_store_ttl=args.cost_store_ttl,
+            billing_cache_path=args.billing_cache,
+            max_bytes_billed=args.max_bytes_billed,
+        ),
+        args.host,
+        args.port,
+    )
@@ -2,4 +2,7 @@
 google-cloud-asset
 google-cloud-resource-manager
 google-cloud-bigquery
-google-cloud-billing
\ No newline at end of file
+google-cloud-billing
+
+# --- OPCIONALES ---
+# pyarrow  (inventory.py --format parquet)
\ No newline at end of file
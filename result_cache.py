@@ -0,0 +1,144 @@
+"""
+Caché en memoria de resultados por clave (p. ej. datos de un proyecto) con un TTL distinto por campo.
+
+Las entradas usadas hace más tiempo se descartan al superar `max_entries` (LRU), y si varios hilos piden
+a la vez la misma clave vencida solo uno consulta: los demás esperan y reciben el mismo resultado.
+Un campo sin TTL no se cachea: `get` consulta siempre, así los scripts de una sola ejecución no cambian.
+
+Las entradas con clave de texto (IDs de proyecto) se pueden guardar en un JSON y recargar en otra ejecución;
+en modo sin conexión (`offline`) se sirve lo guardado sin importar su antigüedad y nunca se consulta.
+"""
+import os
+import json
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+DEFAULT_MAX_ENTRIES = 50_000
+
+T = TypeVar("T")
+_MISSING = object()
+
+
+def write_json_atomic(path: str, data: object, **dump_kwargs) -> None:
+    """Escribe `data` en un temporal propio y lo renombra: escrituras simultáneas al mismo archivo no se pisan"""
+    folder = os.path.dirname(path) or "."
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, **dump_kwargs)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class NotCached(Exception):
+    """Modo sin conexión: el dato pedido no está en la caché local"""
+
+
+class ResultCache:
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.ttls = dict(ttls or {})
+        self.max_entries = max_entries
+        self.offline = False
+        self.entries: "OrderedDict[Tuple[str, Hashable], Tuple[object, float]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.key_locks: Dict[Tuple[str, Hashable], threading.Lock] = {}
+        self.hits = Counter()
+        self.misses = Counter()
+        self.evictions = 0
+
+    def _lookup(self, cache_key: Tuple[str, Hashable], ttl: float):
+        with self.lock:
+            entry = self.entries.get(cache_key)
+            if entry is None or time.time() - entry[1] >= ttl:
+                return _MISSING
+            self.entries.move_to_end(cache_key)
+            self.hits[cache_key[0]] += 1
+            return entry[0]
+
+    def _store(self, cache_key: Tuple[str, Hashable], value: object) -> None:
+        with self.lock:
+            self.entries[cache_key] = (value, time.time())
+            self.entries.move_to_end(cache_key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, field: str, key: Hashable, fetch: Callable[[Hashable], T]) -> T:
+        """Valor cacheado de (`field`, `key`) o el resultado de `fetch(key)`; los errores no se cachean"""
+        if self.offline:
+            value = self._lookup((field, key), float("inf"))
+            if value is _MISSING:
+                raise NotCached(f"{field} de {key} no está en la caché local")
+            return value
+        ttl = self.ttls.get(field)
+        if not ttl:
+            return fetch(key)
+        cache_key = (field, key)
+        value = self._lookup(cache_key, ttl)
+        if value is not _MISSING:
+            return value
+
+        with self.lock:
+            key_lock = self.key_locks.setdefault(cache_key, threading.Lock())
+        with key_lock:
+            # Otro hilo pudo haberla consultado mientras se esperaba el lock
+            value = self._lookup(cache_key, ttl)
+            if value is not _MISSING:
+                return value
+            with self.lock:
+                self.misses[field] += 1
+            try:
+                value = fetch(key)
+                self._store(cache_key, value)
+            finally:
+                # Quien llegue después encuentra la entrada (o vuelve a intentar si falló): el lock ya no hace falta
+                with self.lock:
+                    self.key_locks.pop(cache_key, None)
+            return value
+
+    def load(self, path: str) -> None:
+        """Agrega las entradas guardadas en `path` (si existe) conservando la hora en que se consultaron"""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        for field, by_key in data.items():
+            for key, (value, fetched_at) in by_key.items():
+                self.entries[(field, key)] = (value, fetched_at)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def save(self, path: str) -> None:
+        """Guarda las entradas con clave de texto; las demás (p. ej. reportes completos) solo viven en memoria"""
+        data: Dict[str, Dict[str, list]] = {}
+        with self.lock:
+            for (field, key), (value, fetched_at) in self.entries.items():
+                if isinstance(key, str):
+                    data.setdefault(field, {})[key] = [value, fetched_at]
+        write_json_atomic(path, data)
+
+    def invalidate(self, field: Optional[str] = None) -> int:
+        """Descarta las entradas de `field` (o todas); retorna cuántas se eliminaron"""
+        with self.lock:
+            keys = [cache_key for cache_key in self.entries if field is None or cache_key[0] == field]
+            for cache_key in keys:
+                del self.entries[cache_key]
+            return len(keys)
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "ttls": dict(self.ttls),
+                "hits": dict(self.hits),
+                "misses": dict(self.misses),
+                "evictions": self.evictions,
+            }
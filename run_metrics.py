@@ -0,0 +1,179 @@
+"""
+Métricas de ejecución compartidas por Gen_billing.py, inventory.py y billing_report.py.
+
+Cada script tiene un RunMetrics global donde registra tiempos por etapa, latencia de cada llamada
+a las APIs (con histograma), conteo de llamadas y páginas, y contadores como filas y bytes
+leídos/escritos. Al terminar se guarda un JSON junto al reporte: <reporte>.metrics.json.
+"""
+import os
+import json
+import time
+import cProfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional
+
+# Límites superiores (ms) de los buckets del histograma de latencia; el último bucket es "> 10000"
+LATENCY_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+class CallStats:
+    """Latencias de una llamada (RPC, página o operación): conteo, errores, total, máximo e histograma"""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record(self, seconds: float, error: bool = False) -> None:
+        self.calls += 1
+        self.errors += error
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        millis = seconds * 1000.0
+        for idx, bound in enumerate(LATENCY_BUCKETS_MS):
+            if millis <= bound:
+                self.buckets[idx] += 1
+                return
+        self.buckets[-1] += 1
+
+    def to_dict(self) -> Dict:
+        labels = [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_seconds": round(self.total_seconds, 6),
+            "mean_seconds": round(self.total_seconds / self.calls, 6) if self.calls else 0.0,
+            "max_seconds": round(self.max_seconds, 6),
+            "histogram": {label: n for label, n in zip(labels, self.buckets) if n},
+        }
+
+
+class RunMetrics:
+    """Métricas de una ejecución; seguro para usar desde varios hilos"""
+
+    def __init__(self, script: str) -> None:
+        self.script = script
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.started_at = datetime.now()
+            self.started = time.perf_counter()
+            self.stages: Dict[str, float] = {}
+            self.calls: Dict[str, CallStats] = {}
+            self.counters = Counter()
+            self.info: Dict[str, object] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Cronometra una etapa; si se repite, los tiempos se acumulan"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def record(self, name: str, seconds: float, error: bool = False) -> None:
+        with self.lock:
+            stats = self.calls.get(name)
+            if stats is None:
+                stats = self.calls[name] = CallStats()
+            stats.record(seconds, error)
+
+    @contextmanager
+    def call(self, name: str) -> Iterator[None]:
+        """Cronometra una llamada; si lanza una excepción se cuenta como error y se propaga"""
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.record(name, time.perf_counter() - started, error=True)
+            raise
+        self.record(name, time.perf_counter() - started)
+
+    def timed_pages(self, name: str, pages: Iterable) -> Iterator:
+        """Recorre las páginas de un pager cronometrando la descarga de cada una"""
+        iterator = iter(pages)
+        while True:
+            started = time.perf_counter()
+            try:
+                page = next(iterator)
+            except StopIteration:
+                return
+            except Exception:
+                self.record(name, time.perf_counter() - started, error=True)
+                raise
+            self.record(name, time.perf_counter() - started)
+            yield page
+
+    def paged_results(self, name: str, response) -> Iterator:
+        """Los recursos de un pager de search_all_resources, cronometrando cada página"""
+        for page in self.timed_pages(name, response.pages):
+            yield from page.results
+
+    def add(self, counter: str, amount: float = 1) -> None:
+        with self.lock:
+            self.counters[counter] += amount
+
+    def set_info(self, **values) -> None:
+        with self.lock:
+            self.info.update(values)
+
+    def to_dict(self) -> Dict:
+        with self.lock:
+            return {
+                "script": self.script,
+                "started_at": self.started_at.isoformat(timespec="seconds"),
+                "wall_seconds": round(time.perf_counter() - self.started, 6),
+                **self.info,
+                "stages": {name: round(seconds, 6) for name, seconds in self.stages.items()},
+                "calls": {name: stats.to_dict() for name, stats in sorted(self.calls.items())},
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    def write(self, report_path: str) -> Optional[str]:
+        """Guarda las métricas junto al reporte; un fallo aquí no debe tumbar la ejecución"""
+        path = metrics_path(report_path)
+        try:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"No se pudieron guardar las métricas en {path}: {e}")
+            return None
+        print(f"Métricas de ejecución: {path}")
+        return path
+
+
+def metrics_path(report_path: str) -> str:
+    """'Reports/Billing/Billing_2026-01.csv' -> 'Reports/Billing/Billing_2026-01.metrics.json'"""
+    base = report_path[:-3] if report_path.endswith(".gz") else report_path
+    return f"{os.path.splitext(base)[0]}.metrics.json"
+
+
+def file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def run_profiled(profile_path: Optional[str], func, *args, **kwargs):
+    """Ejecuta `func` bajo cProfile si se indicó `profile_path` y guarda las estadísticas ahí"""
+    if not profile_path:
+        return func(*args, **kwargs)
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        profiler.dump_stats(profile_path)
+        print(f"Perfil cProfile guardado en {profile_path} (ver con: python -m pstats {profile_path})")